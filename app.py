@@ -1,28 +1,26 @@
+import time
+_import_started = time.perf_counter()
+
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-import pymysql
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import jieba
-import re
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response, send_file
+import json
 from datetime import datetime
 import os
-from werkzeug.utils import secure_filename
+import threading
+from auth import AuthBusy, get_auth_service
+from avatars import IMMUTABLE_CACHE_CONTROL, MAX_AVATAR_BYTES, avatar_srcset, avatar_url, is_immutable, save_avatar
+from catalog import Catalog, get_catalog
+from db import get_db_connection, get_pool, run_transaction
+from profile_data import DEFAULT_AVATAR, USER_COLUMNS, User, load_profile
+from rec_cache import RecommendationCache
+from segment_cache import SegmentationCache
+from stats import get_stats
+import wordfreq
+from warmup import WARMUP_MODE, warmup
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # 设置密钥，用于session加密
-
-def get_db_connection():
-    return pymysql.connect(
-        host='127.0.0.1',
-        port=3306,
-        user='root',
-        passwd='yfg,123456',
-        db='spider',
-        charset='utf8'
-    )
+app.config['MAX_CONTENT_LENGTH'] = MAX_AVATAR_BYTES  # 限制上传头像大小
 
 # 登录验证装饰器
 def login_required(f):
@@ -34,6 +32,32 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# 模板中使用 avatar_url(url, size) / avatar_srcset(url, 'webp') 输出响应式头像
+@app.context_processor
+def inject_avatar_helpers():
+    return {'avatar_url': avatar_url, 'avatar_srcset': avatar_srcset}
+
+# 按内容哈希命名的头像文件内容永不改变，可以永久缓存
+@app.after_request
+def cache_avatars(response):
+    if response.status_code in (200, 304) and is_immutable(request.path):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+# 服务开始处理请求后在后台预热推荐引擎（导入依赖、加载 jieba 词典、构建模型）
+@app.before_request
+def start_warmup():
+    if WARMUP_MODE == 'background':
+        warmup.start(get_similarity_engine)
+
+# 就绪检查：推荐引擎预热完成前返回 503
+@app.route('/ready')
+def ready():
+    status = warmup.status()
+    status['ready'] = status['ready'] or _similarity_engine is not None
+    status['app_import_ms'] = APP_IMPORT_MS
+    return jsonify(status), 200 if status['ready'] else 503
+
 # 主页路由 - 需要登录
 @app.route('/')
 @app.route('/index')
@@ -45,34 +69,36 @@ def index():
 @app.route('/toggle_favorite/<int:movie_id>', methods=['POST'])
 @login_required
 def toggle_favorite(movie_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if not get_catalog().get(movie_id):
+        return jsonify({'success': False, 'error': 'Movie not found'}), 404
 
-    try:
-        # 检查是否已收藏
+    user_id = session['user_id']
+
+    # 依赖 (user_id, movie_id) 唯一索引：先尝试取消收藏，没有可删除的记录再添加，
+    # 不需要先 SELECT，并发点击也不会产生重复记录
+    def toggle(cursor):
         cursor.execute('''
-            SELECT id FROM user_favorite_movies
+            DELETE FROM user_favorite_movies
             WHERE user_id = %s AND movie_id = %s
-        ''', (session['user_id'], movie_id))
-
-        existing = cursor.fetchone()
-
-        if existing:
-            # 取消收藏
-            cursor.execute('''
-                DELETE FROM user_favorite_movies
-                WHERE user_id = %s AND movie_id = %s
-            ''', (session['user_id'], movie_id))
-            is_favorite = False
-        else:
-            # 添加收藏
-            cursor.execute('''
-                INSERT INTO user_favorite_movies (user_id, movie_id)
-                VALUES (%s, %s)
-            ''', (session['user_id'], movie_id))
-            is_favorite = True
-
-        conn.commit()
+        ''', (user_id, movie_id))
+        if cursor.rowcount:
+            return False
+
+        # 添加收藏
+        cursor.execute('''
+            INSERT INTO user_favorite_movies (user_id, movie_id)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE movie_id = movie_id
+        ''', (user_id, movie_id))
+        return True
+
+    conn = get_db_connection()
+
+    try:
+        # READ COMMITTED 下未命中的 DELETE 不加间隙锁；并发点击仍发生死锁时整个事务自动重试
+        is_favorite = run_transaction(conn, toggle, isolation='READ COMMITTED')
+        # 收藏变化后该用户的推荐缓存失效
+        recommendation_cache.invalidate(user_id)
         return jsonify({'success': True, 'is_favorite': is_favorite})
 
     except Exception as e:
@@ -80,58 +106,40 @@ def toggle_favorite(movie_id):
         return jsonify({'success': False, 'error': str(e)})
 
     finally:
-        cursor.close()
         conn.close()
 
 # 个人主页路由
 @app.route('/profile')
 @login_required
 def profile():
+    catalog = get_catalog()
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        # 获取用户信息
-        cursor.execute('SELECT * FROM users WHERE id = %s', (session['user_id'],))
-        user = cursor.fetchone()
-
-        # 获取用户收藏的电影
-        cursor.execute('''
-            SELECT m.* FROM movie250 m
-            JOIN user_favorite_movies ufm ON m.id = ufm.movie_id
-            WHERE ufm.user_id = %s
-        ''', (session['user_id'],))
-        favorite_movies = cursor.fetchall()
-
-        # 提取用户喜欢的电影类型
-        movie_types = set()
-        for movie in favorite_movies:
-            # 从电影信息中提取类型
-            info = movie[8]  # 假设电影类型信息在info字段中
-            # 使用正则表达式提取类型信息
-            types = re.findall(r'类型: (.*?)(?:\s|$)', info)
-            if types:
-                # 将类型字符串分割成列表并添加到集合中
-                movie_types.update([t.strip() for t in types[0].split('/')])
-
-        # 获取推荐电影
-        recommended_movies = []
-        if favorite_movies:
-            recommended_movies = get_movie_recommendations(
-                [movie[0] for movie in favorite_movies],
-                cursor
-            )
-
-        return render_template('profile.html',
-                             user=user,
-                             favorite_movies=favorite_movies,
-                             recommended_movies=recommended_movies,
-                             movie_types=list(movie_types))  # 将集合转换为列表
-
+        # 一次查询获取用户信息和收藏的电影ID，电影数据来自内存中的电影目录
+        profile_data = load_profile(cursor, session['user_id'], catalog)
     finally:
         cursor.close()
         conn.close()
 
+    if profile_data is None:
+        session.clear()
+        return redirect(url_for('login'))
+
+    # 获取推荐电影，可按类型筛选（此时已归还数据库连接）
+    recommended_movies = []
+    if profile_data.favorite_movies:
+        recommended_movies = get_movie_recommendations([movie.id for movie in profile_data.favorite_movies],
+                                                       genre=request.args.get('genre'),
+                                                       user_id=session['user_id'])
+
+    return render_template('profile.html',
+                         user=profile_data.user,
+                         favorite_movies=profile_data.favorite_movies,
+                         recommended_movies=recommended_movies,
+                         movie_types=profile_data.movie_types)
+
 
 # 允许上传的图片格式
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -151,6 +159,24 @@ def register():
         avatar = request.files.get('avatar')
         avatar_path = None
 
+        # 密码哈希（独立进程池）和头像保存都在取数据库连接之前完成，等待期间不占用连接
+        try:
+            password_hash = get_auth_service().hash_password(password)
+
+            # 处理头像上传：按内容哈希命名保存原图，缩略图由后台线程池生成
+            if avatar and allowed_file(avatar.filename):
+                ext = avatar.filename.rsplit('.', 1)[1].lower()
+                avatar_path = save_avatar(avatar, ext)
+
+        except AuthBusy:
+            flash('注册人数过多，请稍后再试！', 'danger')
+            return render_template('register.html')
+
+        except Exception as e:
+            print(f"Registration error: {str(e)}")
+            flash('注册过程中发生错误！', 'danger')
+            return render_template('register.html')
+
         conn = get_db_connection()
         cursor = conn.cursor()
 
@@ -161,20 +187,7 @@ def register():
                 flash('用户名已存在！', 'danger')
                 return render_template('register.html')
 
-            # 处理头像上传
-            if avatar and allowed_file(avatar.filename):
-                filename = secure_filename(f"{username}_{int(datetime.now().timestamp())}")
-                ext = avatar.filename.rsplit('.', 1)[1].lower()
-                avatar_filename = f"{filename}.{ext}"
-
-                upload_dir = os.path.join('static', 'uploads', 'avatars')
-                os.makedirs(upload_dir, exist_ok=True)
-
-                avatar_path = f'/static/uploads/avatars/{avatar_filename}'
-                avatar.save(os.path.join('static', 'uploads', 'avatars', avatar_filename))
-
             # 创建新用户
-            password_hash = generate_password_hash(password)
             current_time = datetime.utcnow()
 
             sql = '''
@@ -186,7 +199,7 @@ def register():
             cursor.execute(sql, (
                 username,
                 password_hash,
-                avatar_path or '/static/assets/img/default-avatar.png',
+                avatar_path or DEFAULT_AVATAR,
                 current_time,
                 current_time
             ))
@@ -213,36 +226,37 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute('SELECT * FROM users WHERE username = %s', (username,))
-            user = cursor.fetchone()
-
-            if user and check_password_hash(user[2], password):
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('SELECT %s FROM users WHERE username = %%s' % ', '.join(USER_COLUMNS), (username,))
+                row = cursor.fetchone()
+            finally:
+                # 校验密码前归还连接，等待哈希进程池时不占用数据库连接
+                cursor.close()
+                conn.close()
+            user = User(*row) if row else None
+
+            # 校验密码；last_login 由后台线程批量写入，哈希参数变化时在后台重新哈希并单独取连接更新
+            if get_auth_service().authenticate(user, password):
                 session['logged_in'] = True
                 session['username'] = username
-                session['user_id'] = user[0]
-                session['avatar_url'] = user[5] or '/static/assets/img/default-avatar.png'
-
-                cursor.execute('UPDATE users SET last_login = %s WHERE id = %s',
-                               (datetime.utcnow(), user[0]))
-                conn.commit()
+                session['user_id'] = user.id
+                session['avatar_url'] = user.avatar
 
                 flash('登录成功！', 'success')
                 return redirect(url_for('index'))
             else:
                 flash('用户名或密码错误！', 'error')
 
+        except AuthBusy:
+            flash('登录人数过多，请稍后再试！', 'error')
+
         except Exception as e:
             flash('登录过程中发生错误！', 'error')
             print(f"Login error: {str(e)}")
 
-        finally:
-            cursor.close()
-            conn.close()
-
     return render_template('login.html')
 
 @app.route('/logout')
@@ -251,94 +265,96 @@ def logout():
     flash('您已成功退出！', 'success')
     return redirect(url_for('login'))
 
-def calculate_movie_similarity(movie1, movie2):
-    """Calculate similarity between two movies"""
-    try:
-        similarity = 0
-
-        # 1. Score similarity (25%)
-        if movie1['score'] and movie2['score']:
-            score_similarity = 1 - abs(float(movie1['score']) - float(movie2['score'])) / 10
-            similarity += score_similarity * 0.25
-
-        # 2. Introduction similarity (25%)
-        if movie1['introduce'] and movie2['introduce']:
-            intro_similarity = calculate_text_similarity(movie1['introduce'], movie2['introduce'])
-            similarity += intro_similarity * 0.25
-
-        # 3. Comments similarity (25%)
-        if movie1['comments'] and movie2['comments']:
-            comments_similarity = calculate_text_similarity(movie1['comments'], movie2['comments'])
-            similarity += comments_similarity * 0.25
-
-        # 4. Other info similarity (25%)
-        if movie1['info'] and movie2['info']:
-            info_similarity = calculate_text_similarity(movie1['info'], movie2['info'])
-            similarity += info_similarity * 0.25
-
-        return similarity
-
-    except Exception as e:
-        print(f"Error in calculate_similarity: {str(e)}")
-        return 0
-
-def calculate_text_similarity(text1, text2):
-    """Calculate text similarity"""
+# 每部电影预先保存的相似电影数量
+NEIGHBOR_INDEX_SIZE = 20
+
+_similarity_engine = None
+_similarity_engine_lock = threading.Lock()
+# 每个用户的推荐结果缓存，收藏变化时失效
+recommendation_cache = RecommendationCache(max_entries=10000, ttl=3600)
+_segmentation_cache = None
+# "shared" 读取 artifacts/ 下的共享推荐数据，"off" 每个 worker 自行构建
+ARTIFACT_MODE = os.environ.get('DOUBAN_ARTIFACTS', 'shared')
+_artifact_store = None
+
+
+def get_artifact_store():
+    """Per-process ArtifactStore, created on first use so numpy/scipy stay lazily imported"""
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = warmup.timed_import('artifacts').ArtifactStore()
+    return _artifact_store
+
+
+def get_similarity_engine():
+    """Return the corpus-wide similarity engine, rebuilding it when the catalog version changes"""
+    global _similarity_engine, _segmentation_cache
+
+    catalog = get_catalog()
+
+    # 只要 artifacts.py 共享的推荐数据与当前目录版本一致就优先使用，
+    # 同时丢弃本进程自行构建的引擎，释放其内存
+    if ARTIFACT_MODE != 'off':
+        shared_engine = get_artifact_store().get()
+        if shared_engine is not None and shared_engine.version == catalog.version:
+            _similarity_engine = shared_engine
+            return _similarity_engine
+
+    if _similarity_engine is not None and _similarity_engine.version == catalog.version:
+        return _similarity_engine
+
+    with _similarity_engine_lock:
+        if _similarity_engine is None or _similarity_engine.version != catalog.version:
+            # numpy/scipy/sklearn/jieba 延迟到第一次构建推荐引擎时才导入
+            SimilarityEngine = warmup.timed_import('recommender').SimilarityEngine
+            movies = [movie._asdict() for movie in catalog.movies]
+            if _segmentation_cache is None:
+                _segmentation_cache = SegmentationCache()
+            engine = SimilarityEngine(movies, segmenter=_segmentation_cache)
+            # 预先计算每部电影的 top-k 相似电影，推荐接口只需查表
+            engine.build_neighbor_index(k=NEIGHBOR_INDEX_SIZE)
+            engine.version = catalog.version
+            _similarity_engine = engine
+            # 持久化分词结果，重启后无需再次分词
+            _segmentation_cache.prune(movie['id'] for movie in movies)
+            _segmentation_cache.save()
+    return _similarity_engine
+
+
+def movie_to_dict(movie):
+    """Convert a movie250 row to dictionary format"""
+    return {
+        'id': movie[0],
+        'info_link': movie[1],
+        'pic_link': movie[2],
+        'cname': movie[3],
+        'ename': movie[4],
+        'score': float(movie[5]) if movie[5] else 0.0,
+        'rated': movie[6],
+        'introduce': movie[7],
+        'info': movie[8],
+        'comments': movie[9]
+    }
+
+def get_movie_recommendations(favorite_movie_ids, k=10, aggregate='max', genre=None, user_id=None):
     try:
-        # Text preprocessing
-        def preprocess_text(text):
-            # Remove special characters
-            text = re.sub(r'[^\w\s]', '', text)
-            # Use jieba for word segmentation
-            return ' '.join(jieba.cut(text))
-
-        # Process texts
-        processed_text1 = preprocess_text(text1)
-        processed_text2 = preprocess_text(text2)
-
-        # Use TF-IDF vectorization
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform([processed_text1, processed_text2])
-
-        # Calculate cosine similarity
-        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-
-        return similarity
-    except:
-        return 0
-
-def get_movie_recommendations(favorite_movie_ids, cursor):
-    try:
-        # 获取用户收藏的电影信息
-        favorite_movies_info = []
-        for movie_id in favorite_movie_ids:
-            cursor.execute('SELECT * FROM movie250 WHERE id = %s', (movie_id,))
-            movie = cursor.fetchone()
-            if movie:
-                favorite_movies_info.append(movie)
-
-        # 获取所有其他电影
-        cursor.execute('SELECT * FROM movie250 WHERE id NOT IN (%s)' % ','.join(['%s'] * len(favorite_movie_ids)),
-        tuple(favorite_movie_ids))
-        all_other_movies = cursor.fetchall()
-
-        # 计算相似度并推荐
-        recommendations = []
-        for other_movie in all_other_movies:
-            max_similarity = 0
-            # 计算与每个收藏电影的相似度
-            for fav_movie in favorite_movies_info:
-                similarity = calculate_movie_similarity(fav_movie, other_movie)
-                max_similarity = max(max_similarity, similarity)
-
-            recommendations.append({
-                'movie': other_movie,
-                'similarity': max_similarity
-            })
-
-        # 按相似度排序并返回前10个推荐
-        recommendations.sort(key=lambda x: x['similarity'], reverse=True)
-        return [rec['movie'] for rec in recommendations[:10]]
+        catalog = get_catalog()
+        engine = get_similarity_engine()
+
+        # 收藏未变化时直接使用缓存的推荐结果
+        variant = (k, aggregate, genre)
+        if user_id is not None:
+            cached = recommendation_cache.get(user_id, favorite_movie_ids, engine.version, variant)
+            if cached is not None:
+                return catalog.get_many(cached)
+
+        # 一次矩阵运算计算所有收藏电影与全部电影的相似度（默认取最大值）
+        candidate_ids = catalog.by_genre.get(genre, []) if genre else None
+        top = engine.recommend(favorite_movie_ids, k=k, aggregate=aggregate, candidate_ids=candidate_ids)
+        movie_ids = [movie_id for movie_id, _ in top]
+        if user_id is not None:
+            recommendation_cache.put(user_id, favorite_movie_ids, engine.version, movie_ids, variant)
+        return catalog.get_many(movie_ids)
 
     except Exception as e:
         print(f"Recommendation error: {str(e)}")
@@ -347,66 +363,28 @@ def get_movie_recommendations(favorite_movie_ids, cursor):
 @app.route('/movie/<int:movie_id>/recommendations')
 def movie_recommendations(movie_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Get current movie information
-        cursor.execute('SELECT * FROM movie250 WHERE id = %s', (movie_id,))
-        current_movie = cursor.fetchone()
+        # Get current movie information from the in-memory catalog
+        catalog = get_catalog()
+        current_movie = catalog.get(movie_id)
 
         if not current_movie:
             return "Movie not found", 404
 
+        # Convert current movie data to dictionary format
+        current_movie_dict = movie_to_dict(current_movie)
         # Process comments - convert "|" separated comments to list
-        comments = current_movie[9].split('|') if current_movie[9] else []
+        comments = current_movie.comments.split('|') if current_movie.comments else []
         # Ensure only the first 5 comments are taken
-        comments = comments[:5] if len(comments) > 5 else comments
+        current_movie_dict['comments'] = comments[:5]
 
-        # Convert current movie data to dictionary format
-        current_movie_dict = {
-            'id': current_movie[0],
-            'info_link': current_movie[1],
-            'pic_link': current_movie[2],
-            'cname': current_movie[3],
-            'ename': current_movie[4],
-            'score': float(current_movie[5]) if current_movie[5] else 0.0,
-            'rated': current_movie[6],
-            'introduce': current_movie[7],
-            'info': current_movie[8],
-            'comments': comments  # Now a list of comments
-        }
-
-        # Get all other movies
-        cursor.execute('SELECT * FROM movie250 WHERE id != %s', (movie_id,))
-        all_movies = cursor.fetchall()
-
-        # Calculate movie similarity
+        # Look up the top 6 in the precomputed neighbour index
         recommended_movies = []
-        for movie in all_movies:
-            movie_dict = {
-                'id': movie[0],
-                'info_link': movie[1],
-                'pic_link': movie[2],
-                'cname': movie[3],
-                'ename': movie[4],
-                'score': float(movie[5]) if movie[5] else 0.0,
-                'rated': movie[6],
-                'introduce': movie[7],
-                'info': movie[8],
-                'comments': movie[9]
-            }
-
-            # Calculate similarity
-            similarity = calculate_movie_similarity(current_movie_dict, movie_dict)
-            movie_dict['similarity_score'] = similarity
-            recommended_movies.append(movie_dict)
-
-        # Sort by similarity and get top 6
-        recommended_movies.sort(key=lambda x: x['similarity_score'], reverse=True)
-        recommended_movies = recommended_movies[:6]
-
-        cursor.close()
-        conn.close()
+        for similar_id, similarity in get_similarity_engine().most_similar(movie_id, k=6):
+            similar_movie = catalog.get(similar_id)
+            if similar_movie:
+                movie_dict = movie_to_dict(similar_movie)
+                movie_dict['similarity_score'] = similarity
+                recommended_movies.append(movie_dict)
 
         return render_template('recommendations.html',
                                current_movie=current_movie_dict,
@@ -414,56 +392,164 @@ def movie_recommendations(movie_id):
 
     except Exception as e:
         print(f"Error in movie_recommendations: {str(e)}")
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
         return "An error occurred, please try again later", 500
 
+# 电影列表 JSON 接口返回的字段，不包含 introduce/info/comments 等大字段
+MOVIE_LIST_COLUMNS = ('id', 'info_link', 'pic_link', 'cname', 'ename', 'score', 'rated')
+MOVIE_PAGE_SIZE = 25
+MOVIE_PAGE_SIZE_MAX = 100
+
+
+def parse_movie_cursor(value):
+    """Parse an "<sort value>_<id>" keyset cursor; invalid cursors start from the top"""
+    if not value:
+        return None
+    try:
+        sort_value, movie_id = value.rsplit('_', 1)
+        return float(sort_value), int(movie_id)
+    except ValueError:
+        return None
+
+
+def read_movie_page_args():
+    """Read sort/type/cursor/limit query parameters shared by /movie and /api/movies"""
+    sort = request.args.get('sort', 'score')
+    if sort not in Catalog.SORT_KEYS:
+        sort = 'score'
+    limit = request.args.get('limit', MOVIE_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MOVIE_PAGE_SIZE_MAX))
+    return {
+        'sort': sort,
+        'movie_type': request.args.get('type') or None,
+        'after': parse_movie_cursor(request.args.get('cursor')),
+        'limit': limit,
+    }
+
+
+def get_favorite_movie_ids(cursor, user_id):
+    cursor.execute('''
+        SELECT movie_id FROM user_favorite_movies
+        WHERE user_id = %s
+    ''', (user_id,))
+    return {row[0] for row in cursor.fetchall()}
+
+
 @app.route('/movie')
 @login_required
 def movie():
+    page_args = read_movie_page_args()
+    # 从内存中的电影目录按页获取电影
+    movies, next_cursor = get_catalog().page(**page_args)
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        # 获取所有电影
-        cursor.execute('SELECT * FROM movie250')
-        movies = cursor.fetchall()
-
         # 获取用户收藏的电影ID列表
-        cursor.execute('''
-            SELECT movie_id FROM user_favorite_movies
-            WHERE user_id = %s
-        ''', (session['user_id'],))
-        favorite_movies = {row[0] for row in cursor.fetchall()}
+        favorite_movies = get_favorite_movie_ids(cursor, session['user_id'])
 
         return render_template('movie.html',
                                movies=movies,
-                               favorite_movies=favorite_movies)
+                               favorite_movies=favorite_movies,
+                               next_cursor=next_cursor,
+                               sort=page_args['sort'],
+                               movie_type=page_args['movie_type'])
     finally:
         cursor.close()
         conn.close()
 
-@app.route('/score')
-def score():
-    score = []
-    num = []
+# 电影列表 JSON 接口，供无限滚动加载下一页
+@app.route('/api/movies')
+@login_required
+def movie_list_api():
+    movies, next_cursor = get_catalog().page(**read_movie_page_args())
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    sql = 'select score,count(score) from movie250 group by score'
-    cursor.execute(sql)
-    data = cursor.fetchall()
-    for item in data:
-        score.append(str(item[0]))
-        num.append(item[1])
-    cursor.close()
-    conn.close()
+
+    try:
+        favorite_movies = get_favorite_movie_ids(cursor, session['user_id'])
+
+        return jsonify({
+            'movies': [
+                dict(zip(MOVIE_LIST_COLUMNS, movie), is_favorite=movie.id in favorite_movies)
+                for movie in movies
+            ],
+            'next_cursor': next_cursor
+        })
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.route('/score')
+def score():
+    # 评分分布按数据版本预先计算，请求时不查询数据库
+    distribution = get_stats()['score']
+    score = [item['score'] for item in distribution]
+    num = [item['count'] for item in distribution]
     return render_template("score.html", score=score, num=num)
 
+# 统计数据 JSON 接口：评分、评价人数和类型分布
+@app.route('/api/stats')
+def stats_api():
+    return jsonify(get_stats())
+
+# 词频数据由 wordfreq.py 离线生成，这里只读取并缓存
+WORD_FREQ_MAX_AGE = 3600
+_word_freq = None
+_word_freq_mtime = None
+
+
+def get_word_freq():
+    """Load the word-frequency artifact, re-reading it only when the file changes"""
+    global _word_freq, _word_freq_mtime
+    try:
+        mtime = os.path.getmtime(wordfreq.ARTIFACT_PATH)
+    except OSError:
+        return None
+    if mtime != _word_freq_mtime:
+        with open(wordfreq.ARTIFACT_PATH, encoding='utf-8') as f:
+            _word_freq = json.load(f)
+        _word_freq_mtime = mtime
+    return _word_freq
+
 @app.route('/word')
 def word():
-    return render_template("word.html")
+    word_freq = get_word_freq()
+    response = make_response(render_template(
+        "word.html",
+        words=word_freq['overall'] if word_freq else [],
+        words_by_type=word_freq['by_type'] if word_freq else {}
+    ))
+    response.cache_control.public = True
+    response.cache_control.max_age = WORD_FREQ_MAX_AGE
+    return response
+
+# 词频 JSON 文件，带 ETag/Last-Modified，可被浏览器缓存
+@app.route('/api/word_freq')
+def word_freq_api():
+    if not os.path.exists(wordfreq.ARTIFACT_PATH):
+        return jsonify({'error': 'word frequencies have not been built yet'}), 404
+    return send_file(os.path.abspath(wordfreq.ARTIFACT_PATH), mimetype='application/json',
+                     max_age=WORD_FREQ_MAX_AGE, conditional=True)
+
+# 数据库连接池状态（等待次数、等待时间等）
+@app.route('/stats/db_pool')
+@login_required
+def db_pool_stats():
+    return jsonify(get_pool().stats())
+
+# 密码哈希进程池与 last_login 批量写入状态
+@app.route('/stats/auth')
+@login_required
+def auth_stats():
+    return jsonify(get_auth_service().stats())
+
+# app.py 自身的导入耗时（不含延迟导入的重型依赖）
+APP_IMPORT_MS = round((time.perf_counter() - _import_started) * 1000, 1)
 
 if __name__ == '__main__':
+    if WARMUP_MODE == 'background':
+        # 稍作延迟，等开发服务器完成端口绑定后再预热
+        warmup.start(get_similarity_engine, delay=1.0)
     app.run()
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Versioned on-disk recommendation artifacts shared by all WSGI workers.
+
+A build writes the movie id map, scores, the per-field TF-IDF CSR
+matrices, their vocabularies and the top-k neighbour arrays as .npy files
+into artifacts/<version>/, then points artifacts/CURRENT at it with an
+atomic rename. Workers np.load(..., mmap_mode='r') the arrays, so every
+process shares one physical copy through the page cache, and they pick
+up a new CURRENT without restarting.
+
+    python artifacts.py build [--k 20]
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from recommender import TEXT_FIELDS, SimilarityEngine
+
+ARTIFACT_ROOT = 'artifacts'
+CURRENT_FILE = 'CURRENT'
+# How often workers look at CURRENT for a new version, in seconds
+CHECK_INTERVAL = 5.0
+KEEP_VERSIONS = 2
+
+
+def write_artifacts(engine, catalog_version, root=ARTIFACT_ROOT):
+    """Write engine arrays to a new version directory and make it current"""
+    version_id = time.strftime('%Y%m%d%H%M%S') + f'-{os.getpid()}'
+    tmp_dir = os.path.join(root, f'.{version_id}.tmp')
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, 'ids.npy'), np.asarray(engine.ids, dtype=np.int64))
+    np.save(os.path.join(tmp_dir, 'scores.npy'), np.asarray(engine.scores, dtype=np.float64))
+    for field in TEXT_FIELDS:
+        matrix = engine.matrices[field].tocsr()
+        np.save(os.path.join(tmp_dir, f'{field}.data.npy'), matrix.data.astype(np.float32))
+        np.save(os.path.join(tmp_dir, f'{field}.indices.npy'), matrix.indices.astype(np.int32))
+        np.save(os.path.join(tmp_dir, f'{field}.indptr.npy'), matrix.indptr.astype(np.int64))
+        vectorizer = engine.vectorizers.get(field)
+        vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()} if vectorizer else {}
+        with open(os.path.join(tmp_dir, f'{field}.vocab.json'), 'w', encoding='utf-8') as f:
+            json.dump(vocabulary, f, ensure_ascii=False)
+    if engine.neighbor_ids is not None:
+        np.save(os.path.join(tmp_dir, 'neighbor_ids.npy'), engine.neighbor_ids.astype(np.int32))
+        np.save(os.path.join(tmp_dir, 'neighbor_scores.npy'), engine.neighbor_scores.astype(np.float32))
+
+    meta = {
+        'catalog_version': list(catalog_version),
+        'movies': len(engine.ids),
+        'shapes': {field: list(engine.matrices[field].shape) for field in TEXT_FIELDS},
+        'created_at': time.time(),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    os.rename(tmp_dir, os.path.join(root, version_id))
+    tmp_current = os.path.join(root, f'.{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp_current, 'w') as f:
+        f.write(version_id)
+    os.replace(tmp_current, os.path.join(root, CURRENT_FILE))
+    prune_versions(root, keep=version_id)
+    return version_id
+
+
+def prune_versions(root=ARTIFACT_ROOT, keep=None):
+    """Delete all but the newest KEEP_VERSIONS versions.
+
+    Workers that still map an older version keep their open mappings valid:
+    unlinked files stay readable until they are unmapped.
+    """
+    versions = sorted(name for name in os.listdir(root)
+                      if not name.startswith('.') and os.path.isdir(os.path.join(root, name)))
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def load_artifacts(version_dir):
+    """Memory-map one artifact version into a read-only SimilarityEngine"""
+    def load(name):
+        return np.load(os.path.join(version_dir, name), mmap_mode='r')
+
+    with open(os.path.join(version_dir, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    matrices = {}
+    for field in TEXT_FIELDS:
+        matrices[field] = sparse.csr_matrix(
+            (load(f'{field}.data.npy'), load(f'{field}.indices.npy'), load(f'{field}.indptr.npy')),
+            shape=tuple(meta['shapes'][field]), copy=False)
+
+    has_neighbors = os.path.exists(os.path.join(version_dir, 'neighbor_ids.npy'))
+    return SimilarityEngine.from_arrays(
+        load('ids.npy'), load('scores.npy'), matrices,
+        neighbor_ids=load('neighbor_ids.npy') if has_neighbors else None,
+        neighbor_scores=load('neighbor_scores.npy') if has_neighbors else None,
+        version=tuple(meta['catalog_version']),
+    )
+
+
+class ArtifactStore:
+    """Per-process view of the current artifact version, swapped in when CURRENT changes"""
+
+    def __init__(self, root=ARTIFACT_ROOT, check_interval=CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self._engine = None
+        self._version_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Engine for the current version, or None if no artifacts have been built"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._engine
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                self._checked_at = time.monotonic()
+                try:
+                    with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                        version_id = f.read().strip()
+                except OSError:
+                    return self._engine
+                if version_id != self._version_id:
+                    try:
+                        self._engine = load_artifacts(os.path.join(self.root, version_id))
+                        self._version_id = version_id
+                        print(f"Loaded recommendation artifacts {version_id}")
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Could not load recommendation artifacts {version_id}: {e}")
+        return self._engine
+
+
+def build(root=ARTIFACT_ROOT, k=20):
+    """Build the engine from the database and publish it as the current version"""
+    from catalog import CatalogCache
+    from segment_cache import SegmentationCache
+
+    catalog = CatalogCache(probe_interval=0).get()
+    segmenter = SegmentationCache()
+    engine = SimilarityEngine([movie._asdict() for movie in catalog.movies], segmenter=segmenter)
+    engine.build_neighbor_index(k=k)
+    segmenter.save()
+    os.makedirs(root, exist_ok=True)
+    version_id = write_artifacts(engine, catalog.version, root)
+    print(f"Recommendation artifacts {version_id} written for {len(engine)} movies")
+    return version_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build shared recommendation artifacts")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--root', default=ARTIFACT_ROOT)
+    parser.add_argument('--k', type=int, default=20, help="neighbours kept per movie")
+    args = parser.parse_args(argv)
+    build(args.root, args.k)
+
+
+if __name__ == '__main__':
+    main()
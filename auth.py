@@ -0,0 +1,277 @@
+import atexit
+import inspect
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from werkzeug import security
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from db import get_db_connection
+
+# Hash method for new passwords, in werkzeug's "method:params" form,
+# e.g. "scrypt:65536:8:1" or "pbkdf2:sha256:1000000". Defaults to
+# werkzeug's own default, which existing users were hashed with. Stored
+# hashes are moved to an explicitly configured method on login; with the
+# default, only hashes of the same algorithm with a lower cost are upgraded.
+CONFIGURED_PASSWORD_METHOD = os.environ.get('DOUBAN_PASSWORD_METHOD') or None
+PASSWORD_METHOD = (CONFIGURED_PASSWORD_METHOD
+                   or inspect.signature(generate_password_hash).parameters['method'].default)
+# Hashing processes per worker; 0 hashes on the request thread
+HASH_WORKERS = int(os.environ.get('DOUBAN_HASH_WORKERS', 2))
+# Hashing jobs allowed in flight per worker, and how long a request waits for a slot
+HASH_MAX_PENDING = int(os.environ.get('DOUBAN_HASH_MAX_PENDING', 16))
+HASH_TIMEOUT = float(os.environ.get('DOUBAN_HASH_TIMEOUT', 10))
+# last_login updates are written in one batch at most every LAST_LOGIN_FLUSH_INTERVAL seconds
+LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('DOUBAN_LAST_LOGIN_FLUSH', 2))
+
+
+class AuthBusy(Exception):
+    """Raised when no hashing slot freed up, or a hash did not finish, within HASH_TIMEOUT"""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def hash_method(password_hash):
+    """The "method:params" prefix a werkzeug hash was made with"""
+    return (password_hash or '').split('$', 1)[0]
+
+
+def parse_method(method):
+    """(algorithm, cost) of a werkzeug method string, filling in werkzeug's defaults.
+
+    "scrypt" -> ('scrypt', (32768, 8, 1)), "pbkdf2" -> ('pbkdf2:sha256', (iterations,)).
+    """
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        defaults = (2 ** 15, 8, 1)
+        return 'scrypt', tuple(int(value) for value in params) + defaults[len(params):]
+    if name == 'pbkdf2':
+        hash_name = params[0] if params else 'sha256'
+        iterations = int(params[1]) if len(params) > 1 else getattr(security, 'DEFAULT_PBKDF2_ITERATIONS', 600000)
+        return f'pbkdf2:{hash_name}', (iterations,)
+    return method, ()
+
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool.
+
+    pbkdf2 and scrypt are CPU-bound, so in worker threads they hold the
+    request thread for the whole hash and contend for the GIL. Here they
+    run in up to `workers` processes with at most `max_pending` jobs in
+    flight; requests beyond that wait up to `timeout` seconds for a slot
+    and then get AuthBusy instead of piling up.
+    """
+
+    def __init__(self, method=None, workers=HASH_WORKERS,
+                 max_pending=HASH_MAX_PENDING, timeout=HASH_TIMEOUT):
+        # An explicit method is enforced on every stored hash; the implicit default only raises costs
+        self.explicit = bool(method or CONFIGURED_PASSWORD_METHOD)
+        self.method = method or PASSWORD_METHOD
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Never fork the threaded web worker: a forked child can inherit locks held by
+                # the warm-up, last-login or request threads. Start clean processes instead.
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise AuthBusy('password hashing pool is busy')
+        try:
+            for attempt in range(2):
+                future = None
+                try:
+                    future = self._get_executor().submit(func, *args)
+                    return future.result(timeout=self.timeout)
+                except BrokenProcessPool:
+                    if attempt:
+                        raise
+                    # A hashing process died; start a fresh pool and retry once
+                    with self._lock:
+                        self._executor = None
+                except FuturesTimeout:
+                    future.cancel()
+                    raise AuthBusy(f'password hashing took longer than {self.timeout}s')
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash should be rehashed with self.method.
+
+        With an explicitly configured method, every hash made with another
+        algorithm or other parameters is rehashed. With werkzeug's implicit
+        default, only hashes of the same algorithm whose cost is lower in
+        some parameter and higher in none are; a hash is never moved to
+        another algorithm or to a lower cost.
+        """
+        algorithm, cost = parse_method(hash_method(password_hash))
+        target_algorithm, target_cost = parse_method(self.method)
+        if self.explicit:
+            return (algorithm, cost) != (target_algorithm, target_cost)
+        return (algorithm == target_algorithm and cost != target_cost
+                and all(new >= old for new, old in zip(target_cost, cost)))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+class LastLoginRecorder:
+    """Collects last_login timestamps and writes them in batches on a background thread.
+
+    Logins only record (user_id, time) in memory; one executemany per
+    flush_interval updates every user that logged in since the last
+    flush, keeping only the latest time per user.
+    """
+
+    def __init__(self, connect=get_db_connection, flush_interval=LAST_LOGIN_FLUSH_INTERVAL):
+        self._connect = connect
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.written = 0
+
+    def record(self, user_id, when=None):
+        with self._lock:
+            self._pending[user_id] = when or datetime.utcnow()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='last-login', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('UPDATE users SET last_login = %s WHERE id = %s',
+                               [(when, user_id) for user_id, when in pending.items()])
+            conn.commit()
+            self.batches += 1
+            self.written += len(pending)
+        except Exception as e:
+            conn.rollback()
+            print(f"Error updating last_login for {len(pending)} users: {str(e)}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+class AuthService:
+    """Password checks, registration hashes and login bookkeeping for app.py"""
+
+    def __init__(self, hasher=None, last_login=None):
+        self.hasher = hasher or PasswordHasher()
+        self.last_login = last_login or LastLoginRecorder()
+        self.rehashed = 0
+
+    def hash_password(self, password):
+        return self.hasher.hash(password)
+
+    def authenticate(self, user, password):
+        """Check a password against a User row and do the post-login bookkeeping.
+
+        On success last_login is queued for the background writer and, if
+        needs_rehash() says the stored hash is out of date, the password is
+        rehashed with the current method off the request thread.
+        """
+        if user is None or not user.password or not self.hasher.verify(user.password, password):
+            return False
+        self.last_login.record(user.id)
+        if self.hasher.needs_rehash(user.password):
+            threading.Thread(target=self._rehash, args=(user.id, user.password, password), name='rehash', daemon=True).start()
+        return True
+
+    def _rehash(self, user_id, old_hash, password):
+        try:
+            password_hash = self.hasher.hash(password)
+        except AuthBusy:
+            # Try again on a later login rather than delaying this one
+            return
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # Only replace the hash that was verified, never a password changed in the meantime
+            cursor.execute('UPDATE users SET password = %s WHERE id = %s AND password = %s',
+                           (password_hash, user_id, old_hash))
+            conn.commit()
+            self.rehashed += 1
+        except Exception as e:
+            conn.rollback()
+            print(f"Error rehashing password for user {user_id}: {str(e)}")
+        finally:
+            cursor.close()
+            conn.close()
+
+    def stats(self):
+        return {
+            'method': self.hasher.method,
+            'hash_workers': self.hasher.workers,
+            'rehashed': self.rehashed,
+            'last_login_batches': self.last_login.batches,
+            'last_login_written': self.last_login.written,
+        }
+
+
+_service = None
+_service_pid = None
+_service_lock = threading.Lock()
+
+
+def get_auth_service():
+    """This process's AuthService; like the DB pool, each forked worker builds its own"""
+    global _service, _service_pid
+    pid = os.getpid()
+    if _service is None or _service_pid != pid:
+        with _service_lock:
+            if _service is None or _service_pid != pid:
+                _service = AuthService()
+                _service_pid = pid
+    return _service
+
+
+@atexit.register
+def _shutdown():
+    if _service is not None and _service_pid == os.getpid():
+        _service.last_login.flush()
+        _service.hasher.shutdown()
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+AVATAR_DIR = os.path.join('static', 'uploads', 'avatars')
+AVATAR_URL_PREFIX = '/static/uploads/avatars/'
+# Square thumbnail sizes in pixels; templates pick one with avatar_url()/avatar_srcset()
+AVATAR_SIZES = (48, 96, 192)
+# Uploads larger than this are rejected by Flask before they reach the route
+MAX_AVATAR_BYTES = int(os.environ.get('DOUBAN_MAX_AVATAR_BYTES', 5 * 1024 * 1024))
+AVATAR_WORKERS = int(os.environ.get('DOUBAN_AVATAR_WORKERS', 2))
+# Hashed names never change content, so browsers and proxies may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# <digest>.<ext> for originals, <digest>-<size>.<ext> for thumbnails
+HASHED_NAME = re.compile(r'^([0-9a-f]{20})(?:-(\d+))?\.(png|jpg|jpeg|gif|webp)$')
+# Thumbnails keep a widely supported fallback next to the webp version
+FALLBACK_FORMAT = {'png': 'png', 'gif': 'png', 'jpg': 'jpg', 'jpeg': 'jpg'}
+
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    """Per-process pool; Pillow releases the GIL while resizing and encoding"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=AVATAR_WORKERS, thread_name_prefix='avatar')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _tmp_path(path):
+    # Identical uploads share a name, so two threads may write the same file at once
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def _write_atomic(path, data):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def save_avatar(upload, ext):
+    """Store an uploaded avatar under a content-hashed name and queue its thumbnails.
+
+    Only the raw bytes are written inside the request; resizing runs on a
+    background pool. Identical uploads share one file. Returns the URL of
+    the original, which is what users.avatar_url stores.
+    """
+    data = upload.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    ext = ext.lower()
+    filename = f'{digest}.{ext}'
+    path = os.path.join(AVATAR_DIR, filename)
+
+    os.makedirs(AVATAR_DIR, exist_ok=True)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    if not os.path.exists(_thumbnail_path(digest, AVATAR_SIZES[-1], 'webp')):
+        _get_executor().submit(make_thumbnails, path, digest, ext)
+    return AVATAR_URL_PREFIX + filename
+
+
+def _thumbnail_path(digest, size, ext):
+    return os.path.join(AVATAR_DIR, f'{digest}-{size}.{ext}')
+
+
+def make_thumbnails(path, digest, ext):
+    """Write every AVATAR_SIZES thumbnail as webp and in the fallback format.
+
+    The largest webp is written last, so its presence means the whole set
+    is available.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("Pillow is not installed; serving avatars at their original size")
+        return False
+
+    fallback = FALLBACK_FORMAT.get(ext, 'png')
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            # GIFs are reduced to their first frame; palette images need a real color mode
+            image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+            for size in sorted(AVATAR_SIZES):
+                thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                for out_ext in (fallback, 'webp'):
+                    out_path = _thumbnail_path(digest, size, out_ext)
+                    tmp_path = _tmp_path(out_path)
+                    out = thumbnail.convert('RGB') if out_ext == 'jpg' else thumbnail
+                    out.save(tmp_path, format={'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}[out_ext],
+                             quality=85, optimize=True)
+                    os.replace(tmp_path, out_path)
+        return True
+    except Exception as e:
+        print(f"Error creating avatar thumbnails for {path}: {str(e)}")
+        return False
+
+
+def _parse(url):
+    """(digest, ext) of a hashed avatar URL, or None for default and legacy avatars"""
+    if not url or not url.startswith(AVATAR_URL_PREFIX):
+        return None
+    match = HASHED_NAME.match(url[len(AVATAR_URL_PREFIX):])
+    if not match or match.group(2):
+        return None
+    return match.group(1), match.group(3)
+
+
+def avatar_url(url, size=AVATAR_SIZES[1], fmt=None):
+    """URL of a size x size thumbnail, or the original until the thumbnails exist"""
+    parsed = _parse(url)
+    if parsed is None:
+        return url
+    digest, ext = parsed
+    out_ext = fmt or FALLBACK_FORMAT.get(ext, 'png')
+    if not os.path.exists(_thumbnail_path(digest, AVATAR_SIZES[-1], 'webp')):
+        return url
+    return f'{AVATAR_URL_PREFIX}{digest}-{size}.{out_ext}'
+
+
+def avatar_srcset(url, fmt=None):
+    """srcset value listing every thumbnail width, or '' while they are not ready"""
+    parsed = _parse(url)
+    if parsed is None or not os.path.exists(_thumbnail_path(parsed[0], AVATAR_SIZES[-1], 'webp')):
+        return ''
+    return ', '.join(f'{avatar_url(url, size, fmt)} {size}w' for size in AVATAR_SIZES)
+
+
+def is_immutable(path):
+    """Whether a request path is a content-hashed avatar file"""
+    return path.startswith(AVATAR_URL_PREFIX) and bool(HASHED_NAME.match(path[len(AVATAR_URL_PREFIX):]))
@@ -0,0 +1,235 @@
+"""
+Latency, throughput and peak memory of the app's and spider's hot paths
+on a synthetic movie250 corpus.
+
+Covers catalog loading (from an SQLite stand-in for MySQL), the
+similarity engine (build, neighbour index, per-movie similarities,
+most_similar and recommend), keyset listing, list page parsing and
+comment cleaning. Results are written as JSON so runs can be compared:
+
+    python benchmarks/bench_hotpaths.py --rows 250 --rows 10000
+    python benchmarks/bench_hotpaths.py --compare benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import SqliteCatalogCache, build_sqlite, generate_movies, raw_comments, render_list_pages  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(func, iterations, warmup=1):
+    """Run func repeatedly and summarise its latency; peak memory comes from one extra traced call"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 4),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 4),
+        'p90_ms': round(percentile(timings, 0.90) * 1000, 4),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 4),
+        'max_ms': round(timings[-1] * 1000, 4),
+        'ops_per_s': round(iterations / elapsed, 2) if elapsed else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+class Suite:
+    """Benchmarks for one corpus size; each case is skipped if its optional dependency is missing"""
+
+    def __init__(self, rows, iterations, seed):
+        self.rows = rows
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+        self.movies = generate_movies(rows, seed)
+        self.conn = build_sqlite(self.movies)
+        self.catalog = None
+        self.engine = None
+
+    def cases(self):
+        return [
+            ('catalog_load', self.bench_catalog_load),
+            ('catalog_page', self.bench_catalog_page),
+            ('catalog_page_genre', self.bench_catalog_page_genre),
+            ('engine_build', self.bench_engine_build),
+            ('neighbor_index_build', self.bench_neighbor_index),
+            ('engine_similarities', self.bench_similarities),
+            ('engine_most_similar', self.bench_most_similar),
+            ('engine_recommend', self.bench_recommend),
+            ('parse_list_page', self.bench_parse_list_page),
+            ('clean_comments', self.bench_clean_comments),
+        ]
+
+    def load_catalog(self):
+        if self.catalog is None:
+            self.catalog = SqliteCatalogCache(self.conn).get()
+        return self.catalog
+
+    def build_engine(self):
+        if self.engine is None:
+            from recommender import SimilarityEngine
+            self.engine = SimilarityEngine([movie._asdict() for movie in self.load_catalog().movies])
+        return self.engine
+
+    def random_ids(self, count=1):
+        return [self.rng.randint(1, self.rows) for _ in range(count)]
+
+    def bench_catalog_load(self):
+        return measure(lambda: SqliteCatalogCache(self.conn).get(), max(self.iterations // 10, 3))
+
+    def bench_catalog_page(self):
+        catalog = self.load_catalog()
+        ordered = catalog._orders['score'][0]
+
+        def page():
+            # A random position in the listing, like a user following next_cursor
+            movie = ordered[self.rng.randrange(len(ordered))]
+            catalog.page('score', after=(movie.score_value, movie.id), limit=25)
+        return measure(page, self.iterations)
+
+    def bench_catalog_page_genre(self):
+        catalog = self.load_catalog()
+        genres = sorted(catalog.by_genre)
+        return measure(lambda: catalog.page('rated', movie_type=self.rng.choice(genres), limit=25), self.iterations)
+
+    def bench_engine_build(self):
+        from recommender import SimilarityEngine
+        movies = [movie._asdict() for movie in self.load_catalog().movies]
+        result = measure(lambda: SimilarityEngine(movies), 1, warmup=0)
+        self.build_engine()
+        return result
+
+    def bench_neighbor_index(self):
+        engine = self.build_engine()
+        return measure(lambda: engine.build_neighbor_index(k=20), 1, warmup=0)
+
+    def bench_similarities(self):
+        engine = self.build_engine()
+        return measure(lambda: engine.similarities(self.random_ids()[0]), self.iterations)
+
+    def bench_most_similar(self):
+        engine = self.build_engine()
+        if engine.neighbor_ids is None:
+            engine.build_neighbor_index(k=20)
+        return measure(lambda: engine.most_similar(self.random_ids()[0], k=6), self.iterations)
+
+    def bench_recommend(self):
+        engine = self.build_engine()
+        return measure(lambda: engine.recommend(self.random_ids(5), k=10), self.iterations)
+
+    def bench_parse_list_page(self):
+        from spider import parse_list_page
+        pages = render_list_pages(self.movies[:250])
+        return measure(lambda: parse_list_page(self.rng.choice(pages)), self.iterations)
+
+    def bench_clean_comments(self):
+        from textclean import clean_comments
+        comments = raw_comments(500)
+        return measure(lambda: clean_comments(self.rng.sample(comments, 5)), self.iterations)
+
+    def run(self, only=None):
+        results = {}
+        for name, case in self.cases():
+            if only and name not in only:
+                continue
+            try:
+                results[name] = case()
+            except ImportError as e:
+                results[name] = {'skipped': f'missing dependency: {e.name}'}
+            print(format_line(name, results[name]))
+        return results
+
+
+def format_line(name, result):
+    if 'skipped' in result:
+        return f"  {name:<22} skipped ({result['skipped']})"
+    return (f"  {name:<22} p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  "
+            f"{result['ops_per_s'] or 0:>10.1f} ops/s  peak {result['peak_kib']:>10.1f} KiB")
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'commit': commit,
+    }
+
+
+def compare(previous, current):
+    """Print the p50 change of every case present in both runs"""
+    for rows, cases in current['runs'].items():
+        old_cases = previous.get('runs', {}).get(rows, {})
+        for name, result in cases.items():
+            old = old_cases.get(name, {})
+            if 'p50_ms' in result and old.get('p50_ms'):
+                change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+                print(f"  rows={rows:<7} {name:<22} {old['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} ms "
+                      f"({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, action='append',
+                        help="corpus size; repeat for several sizes (default 250)")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=250)
+    parser.add_argument('--only', action='append', help="run only this case; may be repeated")
+    parser.add_argument('--output', help="results file (default benchmarks/results/<time>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare p50 latencies against")
+    args = parser.parse_args(argv)
+
+    report = {'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(),
+              'iterations': args.iterations, 'seed': args.seed, 'runs': {}}
+    for rows in args.rows or [250]:
+        print(f"rows={rows}")
+        report['runs'][str(rows)] = Suite(rows, args.iterations, args.seed).run(args.only)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Compare the single-pass lxml list-page parser with the original
+BeautifulSoup + regex path on saved Top-250 list pages.
+
+Pages are read from the files given on the command line, from
+benchmarks/fixtures/*.html, or from the spider's HTTP cache
+(crawl once with `python spider.py --http-cache` to populate it).
+Without any of those, ten synthetic pages from benchmarks/corpus.py
+are used, so the parsers can always be checked against each other.
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate_movies, render_list_pages  # noqa: E402
+from http_cache import DEFAULT_CACHE_DIR  # noqa: E402
+from spider import parse_list_page, parse_list_page_legacy  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_pages(paths, cache_dir):
+    """Return the HTML of every fixture page that can be found"""
+    pages = []
+    for path in paths or sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    if pages:
+        return pages
+
+    for path in sorted(glob.glob(os.path.join(cache_dir, '*.gz'))):
+        with gzip.open(path, 'rb') as f:
+            meta = json.loads(f.readline())
+            if 'top250' in meta['url']:
+                pages.append(f.read().decode(meta.get('encoding') or 'utf-8'))
+    if pages:
+        return pages
+
+    print("No fixture or cached pages found; using synthetic Top-250 pages")
+    return render_list_pages(generate_movies(250))
+
+
+def bench(parse, pages, repeat):
+    """Best-of-repeat time to parse every page once, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            parse(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pages', nargs='*', help="saved list page HTML files")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args.pages, args.cache_dir)
+    # Both paths must extract the same movies before their speed is compared
+    mismatches = 0
+    movies = 0
+    for html in pages:
+        new = [list(movie) for movie in parse_list_page(html)]
+        old = parse_list_page_legacy(html)
+        movies += len(new)
+        mismatches += sum(a != b for a, b in zip(new, old)) + abs(len(new) - len(old))
+
+    legacy = bench(parse_list_page_legacy, pages, args.repeat)
+    lxml = bench(parse_list_page, pages, args.repeat)
+    print(f"{len(pages)} pages, {movies} movies, {mismatches} records differing")
+    print(f"bs4 + regex : {legacy * 1000 / len(pages):8.2f} ms/page")
+    print(f"lxml single : {lxml * 1000 / len(pages):8.2f} ms/page  ({legacy / lxml:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
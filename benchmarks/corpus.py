@@ -0,0 +1,199 @@
+"""
+Synthetic movie250 corpus for the benchmarks.
+
+generate_movies(n) returns movie250-shaped rows whose text fields follow
+a Zipf-like word distribution, with info strings in the flattened
+format the spider stores, so parse_info, jieba and the TF-IDF engine see
+realistic input at any size from 250 to 100k rows. The rows can be loaded
+into an SQLite database that stands in for MySQL behind CatalogCache, and
+rendered back into Top-250 list page HTML for the parser.
+"""
+import html
+import itertools
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import MOVIE_COLUMNS, CatalogCache  # noqa: E402
+from movie_meta import GENRES  # noqa: E402
+
+COUNTRIES = ('美国', '中国大陆', '香港', '台湾', '日本', '韩国', '英国', '法国', '德国', '意大利', '印度', '西班牙')
+VOCABULARY_SIZE = 5000
+# Traditional characters, Latin letters, digits and punctuation that clean_comments has to strip
+COMMENT_NOISE = ('！', '。', '，', '……', '“', '”', '~', '!!', '...', 'orz', '2333', '電影', '經典', '導演', '★★★★★')
+
+
+def make_vocabulary(rng, size=VOCABULARY_SIZE):
+    """Random two- and three-character CJK words"""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.choice((2, 2, 3)))))
+    return sorted(words)
+
+
+class TextGenerator:
+    """Draws words with Zipf weights so a few terms are common and most are rare"""
+
+    def __init__(self, rng, vocabulary):
+        self.rng = rng
+        self.vocabulary = vocabulary
+        self.cum_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def words(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)
+
+    def sentence(self, low, high):
+        return ''.join(self.words(self.rng.randint(low, high)))
+
+    def comment(self):
+        """A raw, uncleaned comment the way the spider scrapes it"""
+        parts = self.words(self.rng.randint(8, 30))
+        for _ in range(self.rng.randint(1, 4)):
+            parts.insert(self.rng.randrange(len(parts) + 1), self.rng.choice(COMMENT_NOISE))
+        return ''.join(parts)
+
+
+def generate_movies(n, seed=250):
+    """n movie250 rows (the columns of catalog.MOVIE_COLUMNS) in rank order"""
+    rng = random.Random(seed)
+    text = TextGenerator(rng, make_vocabulary(rng))
+    names = make_vocabulary(random.Random(seed + 1), size=max(n // 2, 100))
+
+    movies = []
+    for index in range(n):
+        movie_id = index + 1
+        director = rng.choice(names)
+        year = rng.randint(1931, 2024)
+        countries = rng.sample(COUNTRIES, rng.choice((1, 1, 2)))
+        genres = rng.sample(GENRES, rng.randint(1, 3))
+        info = (f'导演: {director}   主演: {rng.choice(names)}   {year}   '
+                f'{" ".join(countries)}   {" ".join(genres)}')
+        comments = [text.comment() for _ in range(5)]
+        movies.append((
+            movie_id,
+            f'https://movie.douban.com/subject/{1000000 + movie_id}/',
+            f'https://img.example.com/view/photo/s_ratio_poster/public/p{movie_id}.jpg',
+            text.sentence(1, 2),
+            f'Movie {movie_id}',
+            f'{rng.uniform(7.5, 9.7):.1f}',
+            str(int(rng.paretovariate(1.2) * 50000)),
+            text.sentence(4, 10),
+            info,
+            ' | '.join(comments),
+            director,
+            year,
+            ' '.join(countries),
+            ' '.join(genres),
+        ))
+    return movies
+
+
+def raw_comments(n, seed=250):
+    """n uncleaned comments for the clean_comments benchmark"""
+    rng = random.Random(seed)
+    text = TextGenerator(rng, make_vocabulary(rng))
+    return [text.comment() for _ in range(n)]
+
+
+def build_sqlite(movies, path=':memory:'):
+    """Load rows into an SQLite movie250 table; returns the open connection"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    columns = ', '.join(f'{column} {"INTEGER" if column in ("id", "year") else "TEXT"}' for column in MOVIE_COLUMNS)
+    conn.execute('DROP TABLE IF EXISTS movie250')
+    conn.execute(f'CREATE TABLE movie250 ({columns})')
+    conn.executemany('INSERT INTO movie250 VALUES (%s)' % ', '.join('?' * len(MOVIE_COLUMNS)), movies)
+    conn.commit()
+    return conn
+
+
+class _SharedConnection:
+    """Lets CatalogCache close() a connection that the benchmark keeps open"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def close(self):
+        pass
+
+
+class SqliteCatalogCache(CatalogCache):
+    """CatalogCache over the SQLite stand-in; the version counter becomes a text-length sum"""
+
+    def __init__(self, conn, probe_interval=0):
+        super().__init__(connect=lambda: _SharedConnection(conn), probe_interval=probe_interval)
+
+    def _probe(self, cursor):
+        self.probes += 1
+        cursor.execute('SELECT COUNT(*), MAX(id), TOTAL(LENGTH(info) + LENGTH(comments)) FROM movie250')
+        return tuple(cursor.fetchone())
+
+
+# One element per line like Douban's markup; the legacy regex parser relies on it
+ITEM_TEMPLATE = '''<li>
+<div class="item">
+    <div class="pic">
+        <em class="">{rank}</em>
+        <a href="{link}">
+            <img width="100" alt="{cname}" src="{pic}" class="">
+        </a>
+    </div>
+    <div class="info">
+        <div class="hd">
+            <a href="{link}" class="">
+                <span class="title">{cname}</span>
+                <span class="title">&nbsp;/&nbsp;{ename}</span>
+            </a>
+        </div>
+        <div class="bd">
+            <p class="">
+                导演: {director}&nbsp;&nbsp;&nbsp;主演: {actor}<br>
+                {year}&nbsp;/&nbsp;{countries}&nbsp;/&nbsp;{genres}
+            </p>
+            <div class="star">
+                <span class="rating5-t"></span>
+                <span class="rating_num" property="v:average">{score}</span>
+                <span property="v:best" content="10.0"></span>
+                <span>{rated}人评价</span>
+            </div>
+            <p class="quote">
+                <span class="inq">{introduce}。</span>
+            </p>
+        </div>
+    </div>
+</div>
+</li>
+'''
+
+
+def render_list_page(movies, start=0):
+    """Top-250 list page HTML for up to 25 rows, starting at rank start + 1"""
+    items = []
+    for rank, movie in enumerate(movies, start + 1):
+        row = dict(zip(MOVIE_COLUMNS, movie))
+        items.append(ITEM_TEMPLATE.format(
+            rank=rank,
+            link=row['info_link'],
+            pic=row['pic_link'],
+            cname=html.escape(row['cname']),
+            ename=html.escape(row['ename']),
+            director=html.escape(row['director']),
+            actor=html.escape(row['info'].split('主演: ')[1].split('   ')[0]),
+            year=row['year'],
+            countries='&nbsp;'.join(row['countries'].split()),
+            genres=' '.join(row['genres'].split()),
+            score=row['score'],
+            rated=row['rated'],
+            introduce=html.escape(row['introduce']),
+        ))
+    return ('<html><head><meta charset="utf-8"></head><body><div id="content">'
+            '<ol class="grid_view">' + ''.join(items) + '</ol></div></body></html>')
+
+
+def render_list_pages(movies, per_page=25):
+    return [render_list_page(movies[start:start + per_page], start) for start in range(0, len(movies), per_page)]
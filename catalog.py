@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from typing import NamedTuple
+
+from db import get_db_connection
+from movie_meta import parse_info
+
+MOVIE_COLUMNS = ('id', 'info_link', 'pic_link', 'cname', 'ename', 'score', 'rated', 'introduce', 'info', 'comments',
+                 'director', 'year', 'countries', 'genres')
+# Columns every movie250 table has, including ones created before `spider.py --migrate` added the metadata
+BASE_COLUMNS = MOVIE_COLUMNS[:10]
+
+# Seconds between version probes; in between, requests never touch MySQL
+PROBE_INTERVAL = 10.0
+
+
+class Movie(NamedTuple):
+    """One movie250 row. Field order matches the table, so movie[3] etc. still work"""
+    id: int
+    info_link: str
+    pic_link: str
+    cname: str
+    ename: str
+    score: str
+    rated: str
+    introduce: str
+    info: str
+    comments: str
+    director: str = ''
+    year: int = None
+    countries: tuple = ()
+    genres: tuple = ()
+
+    @property
+    def score_value(self):
+        try:
+            return float(self.score) if self.score else 0.0
+        except ValueError:
+            return 0.0
+
+    @property
+    def rated_value(self):
+        try:
+            return int(self.rated) if self.rated else 0
+        except ValueError:
+            return 0
+
+
+def movie_from_row(row):
+    """Build a Movie from a movie250 row, parsing metadata for rows not yet backfilled or migrated"""
+    movie = Movie(*row[:10])
+    director, year, countries, genres = row[10:14] if len(row) > 10 else (None,) * 4
+    if genres is None:
+        meta = parse_info(movie.info)
+        return movie._replace(director=meta.director, year=meta.year,
+                              countries=meta.countries, genres=meta.genres)
+    return movie._replace(director=director or '', year=year,
+                          countries=tuple(countries.split()) if countries else (),
+                          genres=tuple(genres.split()))
+
+
+class Catalog:
+    """Immutable snapshot of the movie250 table"""
+
+    SORT_KEYS = {
+        'score': lambda movie: movie.score_value,
+        'rated': lambda movie: movie.rated_value,
+    }
+
+    def __init__(self, movies, version):
+        self.movies = tuple(movies)
+        self.version = version
+        self.by_id = {movie.id: movie for movie in self.movies}
+        # Genre -> ids of its movies, in catalog order
+        self.by_genre = {}
+        for movie in self.movies:
+            for genre in movie.genres:
+                self.by_genre.setdefault(genre, []).append(movie.id)
+        # Per sort order: movies sorted by (value desc, id asc) and the matching bisect keys,
+        # for the whole catalog and for each genre
+        self._orders = {}
+        self._genre_orders = {}
+        for sort, value in self.SORT_KEYS.items():
+            ordered = sorted(self.movies, key=lambda movie: (-value(movie), movie.id))
+            self._orders[sort] = (ordered, [(-value(movie), movie.id) for movie in ordered])
+            by_genre = self._genre_orders[sort] = {}
+            for movie in ordered:
+                for genre in movie.genres:
+                    genre_ordered, genre_keys = by_genre.setdefault(genre, ([], []))
+                    genre_ordered.append(movie)
+                    genre_keys.append((-value(movie), movie.id))
+
+    def __len__(self):
+        return len(self.movies)
+
+    def get(self, movie_id):
+        return self.by_id.get(movie_id)
+
+    def get_many(self, movie_ids):
+        """Movies for the given ids, in the given order, skipping unknown ids"""
+        return [self.by_id[movie_id] for movie_id in movie_ids if movie_id in self.by_id]
+
+    def page(self, sort='score', movie_type=None, after=None, limit=25):
+        """Keyset page of movies ordered by sort value descending, then id.
+
+        after is the (sort value, id) of the previous page's last movie.
+        Returns (movies, next_cursor) like the SQL listing did. A type
+        filter bisects into that genre's own ordering, so every page costs
+        the same however rare the genre is.
+        """
+        if movie_type:
+            ordered, keys = self._genre_orders[sort].get(movie_type, ((), ()))
+        else:
+            ordered, keys = self._orders[sort]
+        start = bisect.bisect_right(keys, (-after[0], after[1])) if after else 0
+
+        movies = list(ordered[start:start + limit])
+        if start + limit < len(ordered):
+            last = movies[-1]
+            return movies, f'{self.SORT_KEYS[sort](last)}_{last.id}'
+        return movies, None
+
+
+class CatalogCache:
+    """Read-through, in-process cache of the movie catalog.
+
+    The table only changes when spider.py runs, so rows are loaded once
+    into a Catalog and served from memory. At most every probe_interval
+    seconds a cheap version probe (row count, max id and the
+    catalog_version counter that spider.py bumps on every write) decides
+    whether the snapshot must be reloaded. Only one thread probes at a
+    time; the others keep serving the current snapshot meanwhile.
+    """
+
+    def __init__(self, connect=get_db_connection, probe_interval=PROBE_INTERVAL):
+        self._connect = connect
+        self.probe_interval = probe_interval
+        self._catalog = None
+        self._probed_at = 0.0
+        self._lock = threading.Lock()
+        self._version_warned = False
+        self._columns_warned = False
+        self.loads = 0
+        self.probes = 0
+
+    def get(self):
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._probed_at < self.probe_interval:
+            return catalog
+
+        # Only the very first load waits for another thread; later probes never queue readers
+        if not self._lock.acquire(blocking=catalog is None):
+            return catalog
+        try:
+            if self._catalog is not None and time.monotonic() - self._probed_at < self.probe_interval:
+                return self._catalog
+            conn = self._connect()
+            cursor = conn.cursor()
+            try:
+                version = self._probe(cursor)
+                if self._catalog is None or version != self._catalog.version:
+                    self._catalog = self._load(cursor, version)
+                self._probed_at = time.monotonic()
+            finally:
+                cursor.close()
+                conn.close()
+            return self._catalog
+        finally:
+            self._lock.release()
+
+    def _probe(self, cursor):
+        self.probes += 1
+        cursor.execute('SELECT COUNT(*), MAX(id) FROM movie250')
+        count, max_id = cursor.fetchone()
+        try:
+            cursor.execute('SELECT version FROM catalog_version WHERE id = 1')
+            row = cursor.fetchone()
+        except Exception as e:
+            # Databases created before the counter existed; `python spider.py --migrate` adds it
+            if not self._version_warned:
+                print(f"Catalog version counter unavailable ({e}); only row count and max id are probed")
+                self._version_warned = True
+            row = None
+        return count, max_id, row[0] if row else None
+
+    def _load(self, cursor, version):
+        self.loads += 1
+        try:
+            cursor.execute('SELECT %s FROM movie250 ORDER BY id' % ', '.join(MOVIE_COLUMNS))
+        except Exception as e:
+            # Tables without the metadata columns; movie_from_row parses it from info instead
+            if not self._columns_warned:
+                print(f"movie250 has no metadata columns ({e}); parsing info instead. "
+                      f"Run `python spider.py --migrate` to add them")
+                self._columns_warned = True
+            cursor.execute('SELECT %s FROM movie250 ORDER BY id' % ', '.join(BASE_COLUMNS))
+        return Catalog((movie_from_row(row) for row in cursor.fetchall()), version)
+
+
+catalog_cache = CatalogCache()
+
+
+def get_catalog():
+    """Current catalog snapshot for this process"""
+    return catalog_cache.get()
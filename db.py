@@ -0,0 +1,240 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import pymysql
+
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 3306,
+    'user': 'root',
+    'passwd': 'yfg,123456',
+    'db': 'spider',
+    'charset': 'utf8'
+}
+
+# Pool settings, overridable per deployment through the environment
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', 3600))
+# Waits longer than this are logged
+POOL_SLOW_WAIT = float(os.environ.get('DB_POOL_SLOW_WAIT', 0.1))
+
+# InnoDB picked this transaction as a deadlock victim and rolled it back
+ER_LOCK_DEADLOCK = 1213
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout"""
+
+
+class PooledConnection:
+    """Wrapper around a pymysql connection that goes back to its pool on close()"""
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn, self._created_at)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pymysql connections.
+
+    Up to pool_size idle connections are kept open; under load another
+    max_overflow connections may be opened and are closed again on
+    release. Connections older than recycle seconds are replaced, and idle
+    connections are pinged before being handed out.
+    """
+
+    def __init__(self, creator, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE):
+        self._creator = creator
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._invalidated = 0
+
+    def connect(self):
+        """Check out a connection, waiting up to timeout seconds if the pool is exhausted"""
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    self._open += 1
+                    conn, created_at = None, None
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._checkouts += 1
+            if waited:
+                wait = time.monotonic() - start
+                self._waits += 1
+                self._wait_time += wait
+                self._max_wait = max(self._max_wait, wait)
+
+        if waited and wait > POOL_SLOW_WAIT:
+            print(f"DB pool wait: {wait * 1000:.1f} ms (open={self._open}, size={self.pool_size})")
+
+        try:
+            conn, created_at = self._checkout_ready(conn, created_at)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, conn, created_at)
+
+    def _checkout_ready(self, conn, created_at):
+        """Return a live connection, recycling stale ones and replacing dead ones"""
+        if conn is not None:
+            if time.monotonic() - created_at > self.recycle:
+                self._recycled += 1
+                self._close_quietly(conn)
+                conn = None
+            else:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._invalidated += 1
+                    self._close_quietly(conn)
+                    conn = None
+
+        if conn is None:
+            conn = self._creator()
+            created_at = time.monotonic()
+            self._created += 1
+        return conn, created_at
+
+    def _release(self, conn, created_at):
+        try:
+            # End any open transaction so the next user starts clean
+            conn.rollback()
+        except Exception:
+            self._invalidated += 1
+            self._close_quietly(conn)
+            conn = None
+
+        with self._cond:
+            if conn is not None and len(self._idle) < self.pool_size:
+                self._idle.append((conn, created_at))
+            else:
+                self._open -= 1
+                if conn is not None:
+                    self._close_quietly(conn)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pid': os.getpid(),
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'checked_out': self._open - len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 3),
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'recycled': self._recycled,
+                'invalidated': self._invalidated,
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's connection pool.
+
+    Pools are per process: after a WSGI server forks its workers, each
+    worker lazily builds its own pool instead of sharing inherited sockets.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(lambda: pymysql.connect(**DB_CONFIG))
+                _pool_pid = pid
+    return _pool
+
+
+def get_db_connection():
+    """Check out a pooled connection; close() returns it to the pool"""
+    return get_pool().connect()
+
+
+def run_transaction(conn, work, retries=3, isolation=None):
+    """Run work(cursor) in its own transaction and commit, returning its result.
+
+    A transaction rolled back as a deadlock victim is retried from the
+    start, up to retries attempts in total. isolation (e.g. 'READ
+    COMMITTED') applies to this transaction only.
+    """
+    for attempt in range(retries):
+        cursor = conn.cursor()
+        try:
+            if isolation:
+                cursor.execute(f'SET TRANSACTION ISOLATION LEVEL {isolation}')
+            result = work(cursor)
+            conn.commit()
+            return result
+        except pymysql.err.OperationalError as e:
+            conn.rollback()
+            if e.args[0] != ER_LOCK_DEADLOCK or attempt == retries - 1:
+                raise
+            print(f"Deadlock, retrying transaction ({attempt + 1}/{retries})")
+            time.sleep(random.uniform(0, 0.01 * (attempt + 1)))
+        finally:
+            cursor.close()
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'http')
+
+# Response headers kept alongside the cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+
+class CachedSession(requests.Session):
+    """
+    requests.Session with an on-disk, gzip-compressed cache for GET requests.
+    Successful responses are stored per URL. A cached entry younger than
+    max_age seconds is served without touching the network; an older one
+    is revalidated with If-None-Match / If-Modified-Since and reused on a
+    304. In offline mode only the cache is consulted and a miss returns a
+    504 response, so crawls and parser changes can be replayed without any
+    network traffic.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=0, offline=False):
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.gz')
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def load(self, url):
+        """Return (metadata, body) for a cached URL, or None"""
+        try:
+            with gzip.open(self._path(url), 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url:
+            return None
+        return meta, body
+
+    def _write(self, url, meta, body):
+        """Atomically replace the cache entry of url with meta and body"""
+        path = self._path(url)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n')
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def store(self, url, response):
+        meta = {
+            'url': url,
+            'fetched_at': time.time(),
+            'encoding': response.encoding,
+            'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+        }
+        self._write(url, meta, response.content)
+        self._count('stored')
+
+    def _touch(self, url, meta, body):
+        """Record a successful revalidation so max_age counts from now"""
+        meta['fetched_at'] = time.time()
+        self._write(url, meta, body)
+
+    @staticmethod
+    def _response(url, status_code, body=b'', meta=None):
+        response = requests.Response()
+        response.url = url
+        response.status_code = status_code
+        response._content = body
+        response.headers = CaseInsensitiveDict((meta or {}).get('headers', {}))
+        response.encoding = (meta or {}).get('encoding')
+        response.from_cache = True
+        return response
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() != 'GET':
+            return super().request(method, url, *args, **kwargs)
+
+        cached = self.load(url)
+        if self.offline:
+            if cached is None:
+                self._count('misses')
+                return self._response(url, 504)
+            self._count('hits')
+            return self._response(url, 200, cached[1], cached[0])
+
+        if cached is not None:
+            meta, body = cached
+            if time.time() - meta['fetched_at'] < self.max_age:
+                self._count('hits')
+                return self._response(url, 200, body, meta)
+
+            headers = dict(kwargs.pop('headers', None) or {})
+            if 'ETag' in meta['headers']:
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if 'Last-Modified' in meta['headers']:
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+            kwargs['headers'] = headers
+
+        response = super().request(method, url, *args, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self._count('revalidated')
+            self._touch(url, *cached)
+            return self._response(url, 200, cached[1], cached[0])
+
+        self._count('misses')
+        if response.status_code == 200:
+            self.store(url, response)
+        response.from_cache = False
+        return response
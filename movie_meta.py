@@ -0,0 +1,58 @@
+import re
+from typing import NamedTuple
+
+# Genre vocabulary used by Douban's Top 250 list pages
+GENRES = (
+    '剧情', '喜剧', '动作', '爱情', '科幻', '动画', '悬疑', '惊悚', '恐怖', '犯罪', '同性', '音乐', '歌舞',
+    '传记', '历史', '战争', '西部', '奇幻', '冒险', '灾难', '武侠', '情色', '家庭', '儿童', '运动', '古装',
+    '纪录片', '短片', '黑色电影',
+)
+GENRE_SET = frozenset(GENRES)
+
+# The spider flattens the bd paragraph, so its fields are separated by runs of
+# whitespace (including &nbsp;): "导演: X   主演: Y ... 1994   美国   犯罪 剧情"
+_SEGMENT_SPLIT = re.compile(r'\s{2,}')
+_YEAR = re.compile(r'(1[89]\d\d|20\d\d)')
+
+
+class MovieMeta(NamedTuple):
+    director: str
+    year: int
+    countries: tuple
+    genres: tuple
+
+
+def parse_info(info):
+    """Extract director, year, countries and genres from a movie's info text.
+
+    Works on the flattened string the spider stores, so it is used both at
+    crawl time and to backfill rows scraped before these columns existed.
+    Missing parts come back as '' / None / ().
+    """
+    segments = [segment.strip() for segment in _SEGMENT_SPLIT.split(info or '') if segment.strip()]
+
+    director = ''
+    for segment in segments:
+        if segment.startswith('导演:'):
+            director = segment[len('导演:'):].strip()
+            break
+
+    # The second line of bd is "<year> / <countries> / <genres>"; find it from the end
+    year, countries, genres = None, (), ()
+    for index in range(len(segments) - 1, -1, -1):
+        match = _YEAR.match(segments[index])
+        if match and index + 1 < len(segments):
+            year = int(match.group(1))
+            tail = segments[index + 1:]
+            genres = tuple(token for token in tail[-1].split() if token in GENRE_SET)
+            if len(tail) > 1:
+                countries = tuple(token for segment in tail[:-1] for token in segment.split())
+            break
+
+    if year is None:
+        match = _YEAR.search(info or '')
+        year = int(match.group(1)) if match else None
+    if not genres:
+        genres = tuple(token for token in (info or '').split() if token in GENRE_SET)
+
+    return MovieMeta(director[:255], year, countries, genres)
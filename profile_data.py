@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import NamedTuple
+
+USER_COLUMNS = ('id', 'username', 'password', 'avatar_url', 'last_login', 'created_at')
+DEFAULT_AVATAR = '/static/assets/img/default-avatar.png'
+
+
+class User(NamedTuple):
+    """One users row. Field order matches the table"""
+    id: int
+    username: str
+    password: str
+    avatar_url: str
+    last_login: datetime
+    created_at: datetime
+
+    @property
+    def avatar(self):
+        return self.avatar_url or DEFAULT_AVATAR
+
+
+class Profile(NamedTuple):
+    user: User
+    favorite_movies: list
+    movie_types: list
+
+
+def load_profile(cursor, user_id, catalog):
+    """Load a user and their favorite movies with one query.
+
+    The user row is LEFT JOINed with the favorite ids, so the query count
+    does not depend on how many favorites there are; the movie rows come
+    from the in-memory catalog. Returns None for an unknown user.
+    """
+    cursor.execute('''
+        SELECT %s, f.movie_id
+        FROM users u
+        LEFT JOIN user_favorite_movies f ON f.user_id = u.id
+        WHERE u.id = %%s
+        ORDER BY f.id
+    ''' % ', '.join(f'u.{column}' for column in USER_COLUMNS), (user_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    user = User(*rows[0][:len(USER_COLUMNS)])
+    favorite_movies = catalog.get_many([row[-1] for row in rows if row[-1] is not None])
+
+    # 用户喜欢的电影类型，按出现顺序去重
+    movie_types = list(dict.fromkeys(genre for movie in favorite_movies for genre in movie.genres))
+    return Profile(user, favorite_movies, movie_types)
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens/second up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take one token and return how long the caller must wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.backoff_level = 0
+        self.successes = 0
+
+
+class RateLimiter:
+    """Per-host request pacing shared by every spider fetch function.
+
+    Each host gets a token bucket. A 403/429 or a request exception halves
+    the host's rate and sleeps for an exponentially growing, jittered
+    delay; every increase_after consecutive successes raise the rate again
+    by increase_factor, up to max_rate. Thread-safe, so the threaded and
+    async crawl modes can share one instance.
+    """
+
+    def __init__(self, rate=2.0, burst=4, min_rate=0.2, max_rate=8.0,
+                 backoff_base=5.0, backoff_max=120.0, increase_after=10, increase_factor=1.25):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.increase_after = increase_after
+        self.increase_factor = increase_factor
+
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.successes = 0
+        self.retries = 0
+        self.throttled_time = 0.0
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.rate, self.burst)
+        return state
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            with self._lock:
+                self.throttled_time += seconds
+            time.sleep(seconds)
+
+    def acquire(self, url):
+        """Block until a request to url's host is allowed"""
+        with self._lock:
+            self.requests += 1
+            wait = self._host(url).bucket.reserve()
+        self._sleep(wait)
+
+    def on_success(self, url):
+        with self._lock:
+            self.successes += 1
+            state = self._host(url)
+            state.backoff_level = 0
+            state.successes += 1
+            if state.successes >= self.increase_after:
+                state.successes = 0
+                bucket = state.bucket
+                bucket.rate = min(self.max_rate, bucket.rate * self.increase_factor)
+
+    def backoff(self, url, base=None):
+        """Slow down after a 403/429 or failed request and sleep before the retry"""
+        with self._lock:
+            self.retries += 1
+            state = self._host(url)
+            state.successes = 0
+            bucket = state.bucket
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            ceiling = min(self.backoff_max, (base or self.backoff_base) * 2 ** state.backoff_level)
+            state.backoff_level += 1
+        # Equal jitter: at least half the ceiling, so blocked workers spread out
+        self._sleep(ceiling / 2 + random.uniform(0, ceiling / 2))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'successes': self.successes,
+                'retries': self.retries,
+                'throttled_time': round(self.throttled_time, 3),
+                'rates': {host: round(state.bucket.rate, 3) for host, state in self._hosts.items()},
+            }
@@ -0,0 +1,60 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """Per-user cache of top-N recommendation ids.
+
+    Entries are keyed by user id and remember a hash of the favorite set and
+    the engine version they were computed for, so a changed favorite set or
+    a rebuilt engine is a miss. Bounded by max_entries (LRU) and ttl seconds.
+    Only movie ids are stored, keeping each entry small.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def favorites_hash(favorite_ids):
+        return hashlib.sha1(','.join(map(str, sorted(set(favorite_ids)))).encode()).hexdigest()
+
+    def get(self, user_id, favorite_ids, version, variant=None):
+        """Cached ids for this favorite set and engine version, or None"""
+        key_hash = self.favorites_hash(favorite_ids)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if (entry is None or entry['hash'] != key_hash or entry['version'] != version
+                    or entry['expires'] < time.monotonic() or variant not in entry['results']):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry['results'][variant]
+
+    def put(self, user_id, favorite_ids, version, movie_ids, variant=None):
+        key_hash = self.favorites_hash(favorite_ids)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry['hash'] != key_hash or entry['version'] != version:
+                entry = {'hash': key_hash, 'version': version,
+                         'expires': time.monotonic() + self.ttl, 'results': {}}
+                self._entries[user_id] = entry
+            entry['results'][variant] = tuple(movie_ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,197 @@
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from segment_cache import preprocess_text
+
+# Text fields compared with TF-IDF cosine similarity, 25% each
+TEXT_FIELDS = ('introduce', 'comments', 'info')
+FIELD_WEIGHT = 0.25
+# Score distance term, 25%
+SCORE_WEIGHT = 0.25
+
+
+def _fit_field(docs):
+    """Fit one TF-IDF model over the whole corpus for a single field.
+
+    Rows are L2-normalised by TfidfVectorizer, so the dot product of two
+    rows is their cosine similarity. Empty documents become zero rows and
+    therefore contribute nothing, like the old per-pair check did.
+    """
+    vectorizer = TfidfVectorizer()
+    try:
+        matrix = vectorizer.fit_transform(docs)
+    except ValueError:
+        # Every document is empty: no vocabulary to learn
+        return None, sparse.csr_matrix((len(docs), 0))
+    return vectorizer, matrix.tocsr()
+
+
+class SimilarityEngine:
+    """Corpus-wide similarity model for the movie250 table.
+
+    One vectorizer is fitted per text field over every movie, and the
+    resulting sparse document matrices are kept in memory. Ranking the
+    neighbours of a movie is then a few sparse matrix-vector products.
+    """
+
+    def __init__(self, movies, segmenter=None):
+        """movies: sequence of dicts with id, score, introduce, comments and info.
+
+        segmenter: optional SegmentationCache so unchanged texts are not
+        segmented again on every rebuild.
+        """
+        movies = list(movies)
+        self.ids = np.array([movie['id'] for movie in movies], dtype=np.int64)
+        self.row_of = {int(movie_id): row for row, movie_id in enumerate(self.ids)}
+
+        self.scores = np.array([_to_float(movie['score']) for movie in movies])
+        self.has_score = self.scores > 0
+
+        self.vectorizers = {}
+        self.matrices = {}
+        for field in TEXT_FIELDS:
+            if segmenter is not None:
+                docs = [segmenter.segment(movie['id'], field, movie[field]) for movie in movies]
+            else:
+                docs = [preprocess_text(movie[field]) if movie[field] else '' for movie in movies]
+            self.vectorizers[field], self.matrices[field] = _fit_field(docs)
+
+        # Top-k neighbour table, filled in by build_neighbor_index()
+        self.neighbor_ids = None
+        self.neighbor_scores = None
+        self.version = None
+
+    @classmethod
+    def from_arrays(cls, ids, scores, matrices, neighbor_ids=None, neighbor_scores=None, version=None):
+        """Rebuild an engine from precomputed arrays (see artifacts.py) without refitting.
+
+        The arrays are used as given, so memory-mapped inputs stay shared
+        between processes.
+        """
+        engine = cls.__new__(cls)
+        engine.ids = ids
+        engine.row_of = {int(movie_id): row for row, movie_id in enumerate(ids)}
+        engine.scores = scores
+        engine.has_score = scores > 0
+        engine.vectorizers = {}
+        engine.matrices = matrices
+        engine.neighbor_ids = neighbor_ids
+        engine.neighbor_scores = neighbor_scores
+        engine.version = version
+        return engine
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similarity_block(self, rows):
+        """Weighted similarity of a batch of corpus rows against every movie.
+
+        Returns a dense (len(rows), len(self)) array combining the score
+        distance term with cosine similarity on each text field.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+
+        score_similarity = 1 - np.abs(self.scores[rows, None] - self.scores[None, :]) / 10
+        both_scored = self.has_score[rows, None] & self.has_score[None, :]
+        block = SCORE_WEIGHT * np.where(both_scored, score_similarity, 0)
+
+        for field in TEXT_FIELDS:
+            matrix = self.matrices[field]
+            block += FIELD_WEIGHT * (matrix[rows] @ matrix.T).toarray()
+
+        return block
+
+    def similarities(self, movie_id):
+        """Weighted similarity of one movie against every movie in the corpus"""
+        return self.similarity_block([self.row_of[movie_id]])[0]
+
+    def build_neighbor_index(self, k=20, batch_size=128):
+        """Compute the full similarity matrix in batches and keep the top k per movie.
+
+        Only the compact index is retained: neighbour ids as int32 and their
+        similarities as float32, both shaped (len(self), k) and sorted by
+        descending similarity.
+        """
+        n = len(self.ids)
+        k = max(min(k, n - 1), 0)
+        neighbor_ids = np.empty((n, k), dtype=np.int32)
+        neighbor_scores = np.empty((n, k), dtype=np.float32)
+
+        if k:
+            for start in range(0, n, batch_size):
+                rows = np.arange(start, min(start + batch_size, n))
+                block = self.similarity_block(rows)
+                # A movie is never its own neighbour
+                block[np.arange(len(rows)), rows] = -np.inf
+
+                top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(block, top, axis=1)
+                order = np.argsort(-top_scores, axis=1, kind='stable')
+
+                neighbor_ids[rows] = self.ids[np.take_along_axis(top, order, axis=1)]
+                neighbor_scores[rows] = np.take_along_axis(top_scores, order, axis=1)
+
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+
+    def most_similar(self, movie_id, k=6):
+        """Return the k most similar movies as (movie_id, similarity) pairs"""
+        if movie_id not in self.row_of or len(self.ids) < 2:
+            return []
+        row = self.row_of[movie_id]
+
+        # Constant-time lookup when the neighbour index is deep enough
+        if self.neighbor_ids is not None and k <= self.neighbor_ids.shape[1]:
+            return [(int(neighbor_id), float(score))
+                    for neighbor_id, score in zip(self.neighbor_ids[row, :k], self.neighbor_scores[row, :k])]
+
+        similarity = self.similarities(movie_id)
+        similarity[row] = -np.inf
+
+        k = min(k, len(self.ids) - 1)
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind='stable')]
+        return [(int(self.ids[row]), float(similarity[row])) for row in top]
+
+
+    def recommend(self, favorite_ids, k=10, aggregate='max', candidate_ids=None):
+        """Rank the corpus against a whole set of seed movies at once.
+
+        The seed vectors are gathered into one block and compared with every
+        movie in a single matrix operation; each candidate is scored by the
+        max (or mean) similarity over the seeds. Seeds themselves are never
+        recommended, and candidate_ids (e.g. the movies of one genre) can
+        restrict what may be returned. Returns up to k (movie_id, similarity) pairs.
+        """
+        rows = np.array(sorted({self.row_of[movie_id] for movie_id in favorite_ids if movie_id in self.row_of}),
+                        dtype=np.int64)
+        if not len(rows):
+            return []
+
+        block = self.similarity_block(rows)
+        if aggregate == 'max':
+            similarity = block.max(axis=0)
+        elif aggregate == 'mean':
+            similarity = block.mean(axis=0)
+        else:
+            raise ValueError(f"Unknown aggregate: {aggregate}")
+        similarity[rows] = -np.inf
+        if candidate_ids is not None:
+            allowed = np.zeros(len(self.ids), dtype=bool)
+            allowed[[self.row_of[movie_id] for movie_id in candidate_ids if movie_id in self.row_of]] = True
+            similarity[~allowed] = -np.inf
+
+        k = min(k, int(np.isfinite(similarity).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind='stable')]
+        return [(int(self.ids[row]), float(similarity[row])) for row in top]
+
+
+def _to_float(value):
+    try:
+        return float(value) if value else 0.0
+    except (TypeError, ValueError):
+        return 0.0
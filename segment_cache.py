@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from textclean import strip_punctuation
+
+DEFAULT_CACHE_PATH = os.path.join('cache', 'segments.json.gz')
+
+
+def preprocess_text(text):
+    """Strip punctuation and segment text with jieba"""
+    import jieba  # Imported on first use; see warmup.py
+    return ' '.join(jieba.cut(strip_punctuation(text)))
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class SegmentationCache:
+    """Persistent cache of jieba segmentation results for movie text fields.
+
+    Entries are keyed by movie id and field name and carry a hash of the
+    text they were built from. When the spider rewrites a row the hash no
+    longer matches and that field is segmented again on next use.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def _key(movie_id, field):
+        return f'{movie_id}:{field}'
+
+    def load(self):
+        """Load cached segmentations from disk, ignoring a missing or corrupt file"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable segmentation cache {self.path}: {e}")
+            return
+        with self._lock:
+            self._entries = entries
+            self._dirty = False
+
+    def save(self):
+        """Write the cache to disk if anything changed since the last save"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def segment(self, movie_id, field, text):
+        """Return the segmented form of text, reusing the cached result if unchanged"""
+        if not text:
+            return ''
+        key = self._key(movie_id, field)
+        digest = content_hash(text)
+
+        entry = self._entries.get(key)
+        if entry and entry[0] == digest:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        tokens = preprocess_text(text)
+        with self._lock:
+            self._entries[key] = [digest, tokens]
+            self._dirty = True
+        return tokens
+
+    def prune(self, movie_ids):
+        """Drop entries for movies that are no longer in the table"""
+        live = {str(movie_id) for movie_id in movie_ids}
+        with self._lock:
+            for key in [key for key in self._entries if key.split(':', 1)[0] not in live]:
+                del self._entries[key]
+                self._dirty = True
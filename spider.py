@@ -1,13 +1,25 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
 import random
 import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 import requests
 from bs4 import BeautifulSoup
 import re
 import pymysql
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 from lxml import etree
-from opencc import OpenCC
-import time
+from ratelimit import RateLimiter
+from http_cache import CachedSession, DEFAULT_CACHE_DIR
+from textclean import clean_comment, clean_comments
+from movie_meta import parse_info
 
 # Regular expressions
 findLink = re.compile(r'<a href="(.*?)">')
@@ -18,44 +30,87 @@ findJudge = re.compile(r'<span>(\d*)人评价</span>')
 findInq = re.compile(r'<span class="inq">(.*)</span>')
 findBd = re.compile(r'<p class="">(.*?)</p>', re.S)
 
+# Shared per-host rate limiter used by every fetch function
+rate_limiter = RateLimiter()
+
 def get_bid():
     """Generate random bid value"""
     return ''.join(random.choices(string.ascii_letters + string.digits, k=11))
 
-def askURL(url, session, headers, max_retries=10, delay=5):
+class SharedHeaders:
+    """
+    Request headers whose bid cookie is shared by every fetch of a crawl.
+    Each request sends a snapshot of the current headers. A blocked fetch
+    rotates the bid for all later requests, unless another fetch already
+    replaced the bid it was blocked with, so concurrent 403s rotate once.
+    The wrapped dict is updated in place.
+    """
+
+    def __init__(self, headers):
+        self.headers = headers
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            return dict(self.headers)
+
+    def rotate(self, sent):
+        with self._lock:
+            if self.headers.get('Cookie') == sent.get('Cookie'):
+                self.headers['Cookie'] = f'bid={get_bid()}'
+
+def shared_headers(headers):
+    return headers if isinstance(headers, SharedHeaders) else SharedHeaders(headers)
+
+def askURL(url, session, headers, max_retries=10, delay=5, limiter=None):
     """
     Send request and get page content with retry logic.
-    If blocked (HTTP 403), it retries with a delay up to max_retries times.
+    If blocked (HTTP 403/429) or on a server error (5xx), it backs off
+    through the rate limiter and retries up to max_retries times; delay is
+    the base backoff in seconds.
     """
+    limiter = limiter or rate_limiter
+    headers = shared_headers(headers)
     for attempt in range(max_retries):
+        sent = headers.current()
+        offline = getattr(session, 'offline', False)
         try:
+            if not offline:  # Replaying from the HTTP cache needs no pacing
+                limiter.acquire(url)
             print(f"Attempting to fetch URL: {url} [Attempt {attempt + 1}/{max_retries}]")
-            response = session.get(url, headers=headers, timeout=10)
+            response = session.get(url, headers=sent, timeout=10)
             if response.status_code == 200:
                 print(f"Successfully fetched URL: {url}")
+                limiter.on_success(url)
                 return response.text
-            elif response.status_code == 403:
-                print(f"[Attempt {attempt + 1}/{max_retries}] 403 Forbidden: Access denied. Retrying after {delay} seconds...")
+            elif response.status_code in (403, 429):
+                print(f"[Attempt {attempt + 1}/{max_retries}] {response.status_code}: Access denied. Backing off...")
                 session.cookies.clear()
-                headers['Cookie'] = f'bid={get_bid()}'
-                time.sleep(delay)  # Wait before retrying
+                headers.rotate(sent)
+                limiter.backoff(url, delay)  # Wait before retrying
+            elif response.status_code >= 500 and not offline:  # An offline 504 is a cache miss
+                print(f"[Attempt {attempt + 1}/{max_retries}] {response.status_code}: Server error. Backing off...")
+                limiter.backoff(url, delay)  # Wait before retrying
             else:
                 print(f"Request failed with status code: {response.status_code}")
                 return None
         except Exception as e:
-            print(f"[Attempt {attempt + 1}/{max_retries}] Request exception: {e}. Retrying after {delay} seconds...")
+            print(f"[Attempt {attempt + 1}/{max_retries}] Request exception: {e}. Backing off...")
             session.cookies.clear()
-            headers['Cookie'] = f'bid={get_bid()}'
-            time.sleep(delay)  # Wait before retrying
+            headers.rotate(sent)
+            limiter.backoff(url, delay)  # Wait before retrying
     print("Max retries reached. Skipping this URL.")
     return None
 
 
-def get_comment_page(comment_link, start, session, headers, max_retries=10, delay=5):
+def get_comment_page(comment_link, start, session, headers, max_retries=10, delay=5, limiter=None):
     """
     Get comment page with retry logic.
-    If blocked (HTTP 403), it retries with a delay up to max_retries times.
+    If blocked (HTTP 403/429) or on a server error (5xx), it backs off
+    through the rate limiter and retries up to max_retries times; delay is
+    the base backoff in seconds.
     """
+    limiter = limiter or rate_limiter
     params = {
         'start': start,
         'limit': '20',
@@ -63,23 +118,35 @@ def get_comment_page(comment_link, start, session, headers, max_retries=10, dela
         'status': 'P'
     }
     url = comment_link + 'comments?' + urlencode(params)
+    headers = shared_headers(headers)
     for attempt in range(max_retries):
+        sent = headers.current()
+        offline = getattr(session, 'offline', False)
         try:
+            if not offline:  # Replaying from the HTTP cache needs no pacing
+                limiter.acquire(url)
             print(f"Attempting to fetch comment page: {url} [Attempt {attempt + 1}/{max_retries}]")
-            response = session.get(url, headers=headers, timeout=10)
+            response = session.get(url, headers=sent, timeout=10)
             if response.status_code == 200:
                 print(f"Successfully fetched comment page: {url}")
+                limiter.on_success(url)
                 return response.text
-            elif response.status_code == 403:
-                print(f"[Attempt {attempt + 1}/{max_retries}] 403 Forbidden while fetching comments. Retrying after {delay} seconds...")
+            elif response.status_code in (403, 429):
+                print(f"[Attempt {attempt + 1}/{max_retries}] {response.status_code} while fetching comments. Backing off...")
                 session.cookies.clear()
-                headers['Cookie'] = f'bid={get_bid()}'
-                time.sleep(delay)  # Wait before retrying
+                headers.rotate(sent)
+                limiter.backoff(url, delay)  # Wait before retrying
+            elif response.status_code >= 500 and not offline:  # An offline 504 is a cache miss
+                print(f"[Attempt {attempt + 1}/{max_retries}] {response.status_code} while fetching comments. Backing off...")
+                limiter.backoff(url, delay)  # Wait before retrying
+            else:
+                print(f"Comment page request failed with status code: {response.status_code}")
+                return None
         except Exception as e:
-            print(f"[Attempt {attempt + 1}/{max_retries}] Failed to get comment page: {e}. Retrying after {delay} seconds...")
+            print(f"[Attempt {attempt + 1}/{max_retries}] Failed to get comment page: {e}. Backing off...")
             session.cookies.clear()
-            headers['Cookie'] = f'bid={get_bid()}'
-            time.sleep(delay)  # Wait before retrying
+            headers.rotate(sent)
+            limiter.backoff(url, delay)  # Wait before retrying
     print("Max retries reached. Skipping comment page.")
     return None
 
@@ -91,107 +158,493 @@ def get_comment(comment_page):
 
 def clear(string):
     """Clean comment data"""
-    string = string.strip()
-    string = re.sub("[A-Za-z0-9]", "", string)
-    string = re.sub(r"[！!？｡。，&;＂★＃＄％＆＇（）＊＋－／：；＜＝＞＠［＼］＾＿｀｛｜｝～｟｠｢｣､、〃「」『』【】"
-                    r"〔〕〖〗〘〙#〚〛〜〝〞/?=~〟,〰–—‘’‛“”„‟…‧﹏.]", " ", string)
-    string = re.sub(r"[!\'\"#。$%&()*+,-.←→/:~;<=>?@[\\]^_`_{|}~", " ", string)
-    cc = OpenCC('t2s')  # Traditional to Simplified Chinese
-    return cc.convert(string).lower()
+    return clean_comment(string)
 
-def recreate_database():
-    """Drop and recreate the database"""
-    conn = pymysql.connect(
+MOVIE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS movie250 (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        info_link VARCHAR(255),
+        pic_link VARCHAR(255),
+        cname VARCHAR(255),
+        ename VARCHAR(255),
+        score VARCHAR(10),
+        rated VARCHAR(10),
+        introduce TEXT,
+        info TEXT,
+        comments TEXT,
+        director VARCHAR(255),
+        year SMALLINT,
+        countries VARCHAR(255),
+        genres VARCHAR(255),
+        UNIQUE KEY uk_info_link (info_link),
+        KEY idx_year (year)
+    ) CHARSET=utf8mb4
+'''
+
+# Single-row counter bumped by every write to movie250; app.py probes it
+# instead of checksumming the table to know when to reload its catalog
+CATALOG_VERSION_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id TINYINT PRIMARY KEY,
+        version BIGINT UNSIGNED NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+'''
+
+# Metadata columns added to tables created before they existed
+MOVIE_TABLE_MIGRATIONS = [
+    ('director', '''
+        ALTER TABLE movie250
+            ADD COLUMN director VARCHAR(255),
+            ADD COLUMN year SMALLINT,
+            ADD COLUMN countries VARCHAR(255),
+            ADD COLUMN genres VARCHAR(255),
+            ADD KEY idx_year (year)
+    '''),
+]
+
+def connect_server():
+    """Connect to the MySQL server without selecting a database"""
+    return pymysql.connect(
         host='127.0.0.1',
         port=3306,
         user='root',
         passwd='yfg,123456',
         charset='utf8mb4'
     )
+
+def recreate_database():
+    """Drop and recreate the database"""
+    conn = connect_server()
     cursor = conn.cursor()
     cursor.execute("DROP DATABASE IF EXISTS spider")
     cursor.execute("CREATE DATABASE spider CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
     cursor.execute("USE spider")
-    cursor.execute('''
-        CREATE TABLE movie250 (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            info_link VARCHAR(255),
-            pic_link VARCHAR(255),
-            cname VARCHAR(255),
-            ename VARCHAR(255),
-            score VARCHAR(10),
-            rated VARCHAR(10),
-            introduce TEXT,
-            info TEXT,
-            comments TEXT
-        ) CHARSET=utf8mb4
-    ''')
+    cursor.execute(MOVIE_TABLE_SQL)
+    cursor.execute(CATALOG_VERSION_TABLE_SQL)
+    bump_catalog_version(cursor)
     conn.commit()
     cursor.close()
     conn.close()
 
-def getData(baseurl, session, headers):
+def ensure_database():
+    """Create the database and movie table if missing, keeping existing data"""
+    conn = connect_server()
+    cursor = conn.cursor()
+    cursor.execute("CREATE DATABASE IF NOT EXISTS spider CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cursor.execute("USE spider")
+    cursor.execute(MOVIE_TABLE_SQL)
+    for column, migration in MOVIE_TABLE_MIGRATIONS:
+        cursor.execute("SHOW COLUMNS FROM movie250 LIKE %s", (column,))
+        if not cursor.fetchone():
+            print(f"Migrating movie250: adding {column}...")
+            cursor.execute(migration)
+    # Genre filters run on the in-memory catalog; drop the unused mirror table older versions kept
+    cursor.execute("DROP TABLE IF EXISTS movie_genre")
+    cursor.execute(CATALOG_VERSION_TABLE_SQL)
+    backfill_metadata(cursor)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def bump_catalog_version(cursor):
+    """Mark movie250 as changed; call in the same transaction as the change"""
+    cursor.execute('''
+        INSERT INTO catalog_version (id, version) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    ''')
+
+def meta_columns(info):
+    """director, year, countries and genres column values parsed from info"""
+    meta = parse_info(info)
+    return meta.director, meta.year, ' '.join(meta.countries), ' '.join(meta.genres)
+
+def backfill_metadata(cursor):
+    """Parse director/year/countries/genres for rows scraped before those columns existed"""
+    cursor.execute('SELECT id, info FROM movie250 WHERE genres IS NULL')
+    rows = cursor.fetchall()
+    if not rows:
+        return
+    print(f"Backfilling metadata for {len(rows)} movies...")
+    cursor.executemany(
+        'UPDATE movie250 SET director = %s, year = %s, countries = %s, genres = %s WHERE id = %s',
+        [meta_columns(info) + (movie_id,) for movie_id, info in rows])
+    bump_catalog_version(cursor)
+
+def parse_item(item):
+    """Extract the list-page fields of one movie from its div.item markup"""
+    data = []
+    link = re.findall(findLink, item)[0]
+    data.append(link)
+    imgSrc = re.findall(findImgSrc, item)[0]
+    data.append(imgSrc)
+    titles = re.findall(findTitle, item)
+    if len(titles) == 2:
+        data.append(titles[0])
+        data.append(titles[1].replace('/', ' '))
+    else:
+        data.append(titles[0])
+        data.append('')
+    rating = re.findall(findRating, item)[0]
+    data.append(rating)
+    judgeNum = re.findall(findJudge, item)[0]
+    data.append(judgeNum)
+    inq = re.findall(findInq, item)
+    data.append(inq[0].replace("。", "") if inq else '')
+    bd = re.findall(findBd, item)[0]
+    bd = re.sub('<br(\\s+)?/>(\\s+)?', " ", bd)
+    bd = re.sub('/', " ", bd)
+    data.append(bd.strip())
+    return data
+
+def parse_list_page_legacy(html):
+    """
+    Original BeautifulSoup + regex extraction: serialise every div.item and
+    scan it with the find* patterns. Kept for parser benchmarks.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return [parse_item(str(item)) for item in soup.find_all('div', class_="item")]
+
+
+class MovieListing(NamedTuple):
+    """List-page fields of one movie, in movie250 column order"""
+    info_link: str
+    pic_link: str
+    cname: str
+    ename: str
+    score: str
+    rated: str
+    introduce: str
+    info: str
+
+
+def _flatten_bd(p):
+    """Text of the bd paragraph with <br> and '/' turned into spaces"""
+    parts = [p.text or '']
+    for child in p:
+        if child.tag == 'br':
+            parts.append(' ' + (child.tail or '').lstrip())
+        else:
+            parts.append(etree.tostring(child, encoding='unicode', with_tail=True))
+    return ''.join(parts).replace('/', ' ').strip()
+
+
+def parse_list_page(html):
+    """
+    Extract every movie on a Top-250 list page in a single lxml pass.
+    Each div.item is walked once and its fields are picked up by tag and
+    class as they are met; items missing a link or title are skipped.
+    """
+    movies = []
+    for item in etree.HTML(html).iterfind('.//div[@class="item"]'):
+        link = img = bd = None
+        titles = []
+        rating = judge = inq = ''
+        for el in item.iter('a', 'img', 'span', 'p'):
+            tag = el.tag
+            cls = el.get('class')
+            if tag == 'a':
+                if link is None:
+                    link = el.get('href')
+            elif tag == 'img':
+                if img is None:
+                    img = el.get('src')
+            elif tag == 'span':
+                text = el.text or ''
+                if cls == 'title':
+                    titles.append(text)
+                elif cls == 'rating_num':
+                    rating = text
+                elif cls == 'inq':
+                    inq = text.replace("。", "")
+                elif cls is None and text.endswith('人评价'):
+                    judge = text[:-len('人评价')]
+            elif tag == 'p' and cls == '' and bd is None:
+                bd = _flatten_bd(el)
+        if not link or not titles:
+            print(f"Skipping unparsable item on list page (link={link})")
+            continue
+        movies.append(MovieListing(
+            info_link=link,
+            pic_link=img or '',
+            cname=titles[0],
+            ename=titles[1].replace('/', ' ') if len(titles) == 2 else '',
+            score=rating,
+            rated=judge,
+            introduce=inq,
+            info=bd or '',
+        ))
+    return movies
+
+def fetch_comments(link, session, headers, rank):
+    """Fetch up to 5 comments for a movie and return them cleaned and joined with |"""
+    comments = []
+    for start in range(0, 100, 20):  # Fetch 5 pages, 20 items per page
+        print(f"Fetching comments for movie {rank} (start={start})...")
+        comment_page = get_comment_page(link, start, session, headers)
+        if not comment_page:
+            print(f"Failed to fetch comments for movie {rank} (start={start}). Skipping...")
+            break
+        results = get_comment(comment_page)
+        comments.extend(results)
+        if len(comments) >= 5:
+            break
+    comments = clean_comments(comments[:5])  # Clean comment data in one batch
+    return " | ".join(comments)  # Separate comments with |
+
+CHECKPOINT_PATH = os.path.join('cache', 'spider_checkpoint.json')
+
+def fingerprint(data):
+    """Hash of the list-page fields of a movie (everything except comments)"""
+    return hashlib.sha1('\x1f'.join(str(field) for field in data[:8]).encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+    """
+    Local record of crawl progress used by incremental crawls.
+    Stores which list pages of the current run are done, and for every
+    movie (keyed by info_link) the fingerprint of its list-page fields,
+    its cleaned comments and when they were fetched. An unfinished run is
+    resumed from the first page not yet done.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, comment_max_age=7 * 86400):
+        self.path = path
+        self.comment_max_age = comment_max_age
+        self.flush = None  # Called before a page is marked done so its rows are committed
+        self.lock = threading.Lock()
+        state = {'run': None, 'movies': {}}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint {path}: {e}")
+        self.run = state['run']
+        self.movies = state['movies']
+
+    def save(self):
+        with self.lock:
+            state = json.dumps({'run': self.run, 'movies': self.movies}, ensure_ascii=False)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(state)
+        os.replace(tmp_path, self.path)
+
+    def start_run(self):
+        if self.run and not self.run['finished']:
+            print(f"Resuming crawl: pages already done {sorted(page + 1 for page in self.run['pages'])}")
+        else:
+            self.run = {'started_at': time.time(), 'pages': [], 'finished': False}
+            self.save()
+
+    def page_done(self, page):
+        return page in self.run['pages']
+
+    def finish_page(self, page):
+        if self.flush:
+            self.flush()
+        with self.lock:
+            self.run['pages'].append(page)
+        self.save()
+
+    def finish_run(self, total_pages=10):
+        """Close the run once every page is done; otherwise leave it to be resumed"""
+        with self.lock:
+            missing = total_pages - len(set(self.run['pages']))
+            self.run['finished'] = missing <= 0
+        if missing > 0:
+            print(f"{missing} page(s) not completed. Run again with --incremental to resume.")
+        self.save()
+
+    def plan(self, data):
+        """
+        Decide what to do with one parsed list entry.
+        Returns (skip, comments): skip is True when the list fields are
+        unchanged and the comments are still fresh; otherwise comments holds
+        the cached comments to reuse, or None when they must be refetched.
+        """
+        entry = self.movies.get(data[0])
+        if not entry or time.time() - entry['comments_at'] > self.comment_max_age:
+            return False, None
+        if entry['fingerprint'] == fingerprint(data):
+            return True, None
+        return False, entry['comments']
+
+    def record_movies(self, rows):
+        """Remember rows once they are committed to the database"""
+        now = time.time()
+        with self.lock:
+            for row in rows:
+                entry = self.movies.get(row[0])
+                fresh = not entry or entry['comments'] != row[8]
+                if not row[8]:
+                    # The comment fetch produced nothing; leave it expired so the next run retries
+                    comments_at = 0
+                else:
+                    comments_at = now if fresh else entry['comments_at']
+                self.movies[row[0]] = {
+                    'fingerprint': fingerprint(row),
+                    'comments': row[8],
+                    'comments_at': comments_at,
+                }
+
+
+def getData(baseurl, session, headers, save=None, checkpoint=None):
     """Get movie data with enhanced error handling."""
+    save = save or saveToMysql
     for i in range(0, 10):  # 10 pages, 250 items
+        if checkpoint and checkpoint.page_done(i):
+            print(f"Page {i + 1}/10 already done in this run. Skipping...")
+            continue
         url = baseurl + str(i * 25)
         print(f"Fetching page {i + 1}/10: {url}")
         html = askURL(url, session, headers)
         if not html:
             print(f"Failed to fetch page {i + 1}/10: {url}. Skipping...")
             continue
-        soup = BeautifulSoup(html, "html.parser")
-        for idx, item in enumerate(soup.find_all('div', class_="item")):
+        for idx, movie in enumerate(parse_list_page(html)):
             try:
                 print(f"Processing movie {i * 25 + idx + 1}...")
-                data = []
-                item = str(item)
-
-                link = re.findall(findLink, item)[0]
-                data.append(link)
-                imgSrc = re.findall(findImgSrc, item)[0]
-                data.append(imgSrc)
-                titles = re.findall(findTitle, item)
-                if len(titles) == 2:
-                    data.append(titles[0])
-                    data.append(titles[1].replace('/', ' '))
-                else:
-                    data.append(titles[0])
-                    data.append('')
-                rating = re.findall(findRating, item)[0]
-                data.append(rating)
-                judgeNum = re.findall(findJudge, item)[0]
-                data.append(judgeNum)
-                inq = re.findall(findInq, item)
-                data.append(inq[0].replace("。", "") if inq else '')
-                bd = re.findall(findBd, item)[0]
-                bd = re.sub('<br(\\s+)?/>(\\s+)?', " ", bd)
-                bd = re.sub('/', " ", bd)
-                data.append(bd.strip())
-
-                # Get comments
-                comments = []
-                for start in range(0, 100, 20):  # Fetch 5 pages, 20 items per page
-                    print(f"Fetching comments for movie {i * 25 + idx + 1} (start={start})...")
-                    comment_page = get_comment_page(link, start, session, headers)
-                    if not comment_page:
-                        print(f"Failed to fetch comments for movie {i * 25 + idx + 1} (start={start}). Skipping...")
-                        break
-                    results = get_comment(comment_page)
-                    comments.extend(results)
-                    if len(comments) >= 5:
-                        break
-                comments = [clear(comment) for comment in comments[:5]]  # Clean comment data
-                data.append(" | ".join(comments))  # Separate comments with |
-
-                print(f"Scraped movie {i * 25 + idx + 1}: {titles[0]}")
-                saveToMysql(data)  # Save each movie data immediately
+                data = list(movie)
+                skip, comments = checkpoint.plan(data) if checkpoint else (False, None)
+                if skip:
+                    print(f"Movie {i * 25 + idx + 1} unchanged. Skipping...")
+                    continue
+                if comments is None:
+                    comments = fetch_comments(data[0], session, headers, i * 25 + idx + 1)
+                data.append(comments)
+
+                print(f"Scraped movie {i * 25 + idx + 1}: {data[2]}")
+                save(data)  # Hand each movie to the writer immediately
             except Exception as e:
                 print(f"Error processing movie {i * 25 + idx + 1}: {e}")
+        if checkpoint:
+            checkpoint.finish_page(i)
 
 
-def saveToMysql(data):
-    """Save data to database with utf8mb4 charset."""
-    conn = pymysql.connect(
+# Default cap on in-flight requests per host in the async crawl
+MAX_PER_HOST = 4
+
+
+class HostPoliteness:
+    """Per-host politeness for the async crawler.
+
+    Caps the number of in-flight requests to each host; request spacing and
+    backoff are handled by the shared rate limiter inside the fetch helpers.
+    """
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        host = urlparse(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        async with self._semaphores[host]:
+            yield
+
+
+async def getDataAsync(baseurl, headers, concurrency=8, max_per_host=MAX_PER_HOST, save=None, checkpoint=None,
+                       session_factory=requests.Session):
+    """Crawl list pages and per-movie comment pages concurrently.
+
+    Fetches run through the blocking askURL/get_comment_page helpers on a
+    bounded thread pool. Each worker thread has its own requests.Session,
+    while all of them share one bid cookie: after a block the rotated bid
+    is used by every later request, as in the sequential crawl. Movies are
+    saved in rank order so ids still follow the Top-250 ranking.
+    """
+    save = save or saveToMysql
+    headers = shared_headers(headers)
+    politeness = HostPoliteness(max_per_host)
+    local = threading.local()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def thread_session():
+        if not hasattr(local, 'session'):
+            local.session = session_factory()
+        return local.session
+
+    async def run(url, fetch):
+        """Run fetch(session) on the thread pool under the per-host limits of url"""
+        async with politeness.slot(url):
+            return await loop.run_in_executor(executor, lambda: fetch(thread_session()))
+
+    async def fetch_page(i):
+        if checkpoint and checkpoint.page_done(i):
+            print(f"Page {i + 1}/10 already done in this run. Skipping...")
+            return None
+        url = baseurl + str(i * 25)
+        print(f"Fetching page {i + 1}/10: {url}")
+        html = await run(url, lambda session: askURL(url, session, headers))
+        if not html:
+            print(f"Failed to fetch page {i + 1}/10: {url}. Skipping...")
+            return None
+        return parse_list_page(html)
+
+    async def scrape_movie(rank, movie):
+        try:
+            print(f"Processing movie {rank}...")
+            data = list(movie)
+            skip, cached_comments = checkpoint.plan(data) if checkpoint else (False, None)
+            if skip:
+                print(f"Movie {rank} unchanged. Skipping...")
+                return None
+            if cached_comments is not None:
+                data.append(cached_comments)
+                print(f"Scraped movie {rank}: {data[2]}")
+                return data
+
+            comments = []
+            for start in range(0, 100, 20):  # Fetch 5 pages, 20 items per page
+                print(f"Fetching comments for movie {rank} (start={start})...")
+                comment_page = await run(
+                    data[0], lambda session: get_comment_page(data[0], start, session, headers))
+                if not comment_page:
+                    print(f"Failed to fetch comments for movie {rank} (start={start}). Skipping...")
+                    break
+                comments.extend(get_comment(comment_page))
+                if len(comments) >= 5:
+                    break
+            data.append(" | ".join(clean_comments(comments[:5])))
+            print(f"Scraped movie {rank}: {data[2]}")
+            return data
+        except Exception as e:
+            print(f"Error processing movie {rank}: {e}")
+            return None
+
+    try:
+        pages = await asyncio.gather(*(fetch_page(i) for i in range(0, 10)))
+        tasks = [[asyncio.create_task(scrape_movie(i * 25 + idx + 1, movie)) for idx, movie in enumerate(movies)]
+                 if movies is not None else None
+                 for i, movies in enumerate(pages)]
+        # Await in rank order: earlier movies are saved while later ones are still being fetched
+        for i, page_tasks in enumerate(tasks):
+            if page_tasks is None:
+                continue
+            for task in page_tasks:
+                data = await task
+                if data:
+                    await loop.run_in_executor(executor, save, data)
+            if checkpoint:
+                await loop.run_in_executor(executor, checkpoint.finish_page, i)
+    finally:
+        executor.shutdown(wait=False)
+
+
+MOVIE_COLUMNS = ('info_link', 'pic_link', 'cname', 'ename', 'score', 'rated', 'introduce', 'info', 'comments',
+                 'director', 'year', 'countries', 'genres')
+
+def connect_db():
+    """Connect to the spider database with utf8mb4 charset."""
+    return pymysql.connect(
         host='127.0.0.1',
         port=3306,
         user='root',
@@ -199,32 +652,198 @@ def saveToMysql(data):
         db='spider',
         charset='utf8mb4'
     )
-    cursor = conn.cursor()
-    sql = '''
-        INSERT INTO movie250(info_link, pic_link, cname, ename, score, rated, introduce, info, comments)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    '''
-    try:
-        cursor.execute(sql, data)
-        conn.commit()
-    except Exception as e:
-        print(f"Error saving to database: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
 
-def main():
-    baseurl = "https://movie.douban.com/top250?start="
-    session = requests.Session()
+def saveToMysql(data):
+    """Save data to database with utf8mb4 charset."""
+    with MovieWriter(batch_size=1) as writer:
+        writer.add(data)
+
+
+class MovieWriter:
+    """
+    Buffered writer for scraped movies.
+    Keeps one connection open, collects rows and writes them with
+    executemany, committing once per batch. A batch is flushed when it
+    reaches batch_size rows or when flush_interval seconds have passed
+    since the last flush, and on close(). With upsert=True rows are keyed
+    on info_link, so a re-crawl updates existing movies in place.
+    Director, year, countries and genres are parsed from info on the way
+    in.
+    """
+
+    def __init__(self, batch_size=25, flush_interval=30, upsert=False, connect=connect_db, on_written=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.upsert = upsert
+        self.on_written = on_written
+        self.conn = connect()
+        self.rows = []
+        self.written = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        columns = ', '.join(MOVIE_COLUMNS)
+        placeholders = ', '.join(['%s'] * len(MOVIE_COLUMNS))
+        self.sql = f'INSERT INTO movie250({columns}) VALUES ({placeholders})'
+        if upsert:
+            self.ensure_unique_info_link()
+            updates = ', '.join(f'{column} = VALUES({column})' for column in MOVIE_COLUMNS[1:])
+            self.sql += f' ON DUPLICATE KEY UPDATE {updates}'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def ensure_unique_info_link(self):
+        """Add the unique key upserts rely on to tables created before it existed"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SHOW INDEX FROM movie250 WHERE Key_name = 'uk_info_link'")
+            if not cursor.fetchone():
+                print("Adding unique key on movie250.info_link...")
+                cursor.execute('ALTER TABLE movie250 ADD UNIQUE KEY uk_info_link (info_link)')
+                self.conn.commit()
+        finally:
+            cursor.close()
+
+    def add(self, data):
+        """Buffer one movie row, flushing if a size or time threshold is reached"""
+        row = tuple(data[:len(MOVIE_COLUMNS) - 4]) + meta_columns(data[7])
+        with self.lock:
+            self.rows.append(row)
+            if len(self.rows) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        rows, self.rows = self.rows, []
+        self.last_flush = time.monotonic()
+        if not rows:
+            return
+        cursor = self.conn.cursor()
+        saved = rows
+        try:
+            cursor.executemany(self.sql, rows)
+            bump_catalog_version(cursor)
+            self.conn.commit()
+            print(f"Saved batch of {len(rows)} movies ({self.written + len(rows)} total)")
+        except Exception as e:
+            print(f"Error saving batch to database: {e}. Retrying row by row...")
+            self.conn.rollback()
+            # Isolate the bad row instead of losing the whole batch
+            saved = []
+            for row in rows:
+                try:
+                    cursor.execute(self.sql, row)
+                    bump_catalog_version(cursor)
+                    self.conn.commit()
+                    saved.append(row)
+                except Exception as e:
+                    print(f"Error saving to database: {e}")
+                    self.conn.rollback()
+        finally:
+            cursor.close()
+        self.written += len(saved)
+        if self.on_written and saved:
+            self.on_written(saved)
+
+    def close(self):
+        """Flush whatever is buffered and close the connection"""
+        if self.conn is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+            self.conn = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Douban Top 250 into MySQL")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="fetch list and comment pages concurrently")
+    parser.add_argument('--concurrency', type=int, default=8, help="max concurrent requests (async mode)")
+    parser.add_argument('--per-host', type=int, default=MAX_PER_HOST, help="max concurrent requests per host (async mode)")
+    parser.add_argument('--baseurl', default="https://movie.douban.com/top250?start=")
+    parser.add_argument('--batch-size', type=int, default=25, help="rows written per executemany batch")
+    parser.add_argument('--flush-interval', type=float, default=30, help="max seconds between batch flushes")
+    parser.add_argument('--upsert', action='store_true',
+                        help="update existing rows by info_link instead of recreating the database")
+    parser.add_argument('--incremental', action='store_true',
+                        help="resume from the checkpoint and only rewrite new or changed movies (implies --upsert)")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help="checkpoint file for incremental crawls")
+    parser.add_argument('--comment-max-age', type=float, default=7,
+                        help="days before a movie's comments are refetched (incremental mode)")
+    parser.add_argument('--http-cache', nargs='?', const=DEFAULT_CACHE_DIR, default=None, metavar='DIR',
+                        help="cache responses on disk and revalidate them with conditional GETs")
+    parser.add_argument('--cache-max-age', type=float, default=0,
+                        help="seconds a cached response is served without revalidation")
+    parser.add_argument('--word-freq', action='store_true',
+                        help="incrementally rebuild the /word frequency artifact after crawling")
+    parser.add_argument('--artifacts', action='store_true',
+                        help="rebuild the shared recommendation artifacts after crawling "
+                             "(done automatically once artifacts have been published)")
+    parser.add_argument('--offline', action='store_true',
+                        help="replay responses from the HTTP cache only, never touching the network")
+    parser.add_argument('--migrate', action='store_true',
+                        help="only create/upgrade the schema and backfill metadata, then exit")
+    args = parser.parse_args(argv)
+
+    if args.migrate:
+        ensure_database()
+        return
+
+    baseurl = args.baseurl
+    if args.http_cache or args.offline:
+        cache_dir = args.http_cache or DEFAULT_CACHE_DIR
+        session_factory = lambda: CachedSession(cache_dir, max_age=args.cache_max_age, offline=args.offline)
+    else:
+        session_factory = requests.Session
+    session = session_factory()
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
         "Cookie": f"bid={get_bid()}"
     }
 
-    recreate_database()  # Recreate the database at the start
-    getData(baseurl, session, headers)
-    time.sleep(2)  # Add delay to avoid being blocked
+    checkpoint = None
+    if args.incremental:
+        ensure_database()
+        checkpoint = Checkpoint(args.checkpoint, comment_max_age=args.comment_max_age * 86400)
+        checkpoint.start_run()
+    elif args.upsert:
+        ensure_database()
+    else:
+        recreate_database()  # Recreate the database at the start
+        # The checkpointed movies are gone with the old table; a later --incremental run must refetch them
+        if os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+            print(f"Removed checkpoint {args.checkpoint}")
+
+    upsert = args.upsert or args.incremental
+    on_written = checkpoint.record_movies if checkpoint else None
+    with MovieWriter(args.batch_size, args.flush_interval, upsert=upsert, on_written=on_written) as writer:
+        if checkpoint:
+            checkpoint.flush = writer.flush
+        if args.use_async:
+            asyncio.run(getDataAsync(baseurl, headers, concurrency=args.concurrency,
+                                     max_per_host=args.per_host, save=writer.add, checkpoint=checkpoint,
+                                     session_factory=session_factory))
+        else:
+            getData(baseurl, session, headers, save=writer.add, checkpoint=checkpoint)
+    if checkpoint:
+        checkpoint.finish_run()
+    if args.word_freq:
+        import wordfreq  # Pulls in jieba; only needed for this step
+        wordfreq.build()
+    if args.artifacts or os.path.exists(os.path.join('artifacts', 'CURRENT')):
+        # Web workers only share artifacts that match the catalog, so republish them after every crawl
+        import artifacts  # Pulls in numpy, scipy, sklearn and jieba
+        artifacts.build()
+    print(f"Request stats: {rate_limiter.stats()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+import threading
+from collections import Counter
+
+from catalog import get_catalog
+
+# Upper bounds of the rating-count buckets (number of people who rated)
+RATED_BUCKETS = (100000, 200000, 500000, 1000000, 2000000)
+
+
+def _rated_label(index):
+    lower = RATED_BUCKETS[index - 1] if index else 0
+    if index == len(RATED_BUCKETS):
+        return f'{lower}+'
+    return f'{lower}-{RATED_BUCKETS[index]}'
+
+
+def build_stats(catalog):
+    """Score, rating-count and type distributions of one catalog snapshot"""
+    # Score is stored as VARCHAR: bucket on the numeric value and sort numerically
+    scores = Counter(round(movie.score_value, 1) for movie in catalog.movies if movie.score)
+
+    rated = Counter()
+    for movie in catalog.movies:
+        value = movie.rated_value
+        index = next((i for i, bound in enumerate(RATED_BUCKETS) if value < bound), len(RATED_BUCKETS))
+        rated[index] += 1
+
+    types = Counter(genre for movie in catalog.movies for genre in movie.genres)
+
+    return {
+        'version': [str(part) for part in catalog.version],
+        'total': len(catalog),
+        'score': [{'score': f'{score:.1f}', 'count': count} for score, count in sorted(scores.items())],
+        'rated': [{'range': _rated_label(index), 'count': rated[index]} for index in range(len(RATED_BUCKETS) + 1)],
+        'types': [{'type': genre, 'count': count} for genre, count in types.most_common()],
+    }
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_stats():
+    """Statistics for the current catalog, rebuilt only when its version changes"""
+    global _stats
+    catalog = get_catalog()
+    stats = _stats
+    if stats is None or stats[0] != catalog.version:
+        with _stats_lock:
+            if _stats is None or _stats[0] != catalog.version:
+                _stats = (catalog.version, build_stats(catalog))
+            stats = _stats
+    return stats[1]
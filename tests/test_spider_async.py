@@ -0,0 +1,194 @@
+"""
+Runs the spider against a local http.server stub: one Top-250 list page
+with two movies and their comment pages, where the first comment request
+of the second movie is refused with a 403. The stub also serves ETags and
+304s, for the retry and HTTP cache paths of the fetch helpers.
+"""
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spider  # noqa: E402
+from http_cache import CachedSession  # noqa: E402
+from ratelimit import RateLimiter  # noqa: E402
+
+ITEM = '''<li><div class="item">
+<div class="pic"><em class="">{rank}</em><a href="{link}"><img width="100" alt="{title}" src="{base}/p{rank}.jpg" class=""></a></div>
+<div class="info">
+<div class="hd"><a href="{link}" class=""><span class="title">{title}</span><span class="title">&nbsp;/&nbsp;Movie {rank}</span></a></div>
+<div class="bd">
+<p class="">导演: 导演{rank}&nbsp;&nbsp;&nbsp;主演: 演员{rank}<br>
+1994&nbsp;/&nbsp;美国&nbsp;/&nbsp;犯罪 剧情</p>
+<div class="star"><span class="rating5-t"></span><span class="rating_num" property="v:average">9.{rank}</span>
+<span property="v:best" content="10.0"></span><span>{rank}000人评价</span></div>
+<p class="quote"><span class="inq">简介{rank}。</span></p>
+</div></div></div></li>
+'''
+
+COMMENTS = ('<html><body><div class="mod-bd">'
+            + ''.join(f'<div class="comment-item"><div class="comment"><p><span class="short">{text}</span></p></div></div>'
+                      for text in ('非常好看', '值得一看', '经典之作', '百看不厌', '感人至深'))
+            + '</div></body></html>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # (path, Cookie header, status) of every request, in arrival order
+    log = []
+    lock = threading.Lock()
+    # Path -> status answered to its first request only
+    fail_once = {}
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        status, body = self.route(path)
+        etag = '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            status, body = 304, ''
+        with self.lock:
+            self.log.append((path, self.headers.get('Cookie'), status))
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if status in (200, 304):
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def route(self, path):
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        if path == '/top250':
+            if self.path.endswith('start=0'):
+                items = ''.join(ITEM.format(rank=rank, title=f'电影{rank}', base=base,
+                                            link=f'{base}/subject/{rank}/') for rank in (1, 2))
+                return 200, f'<html><body><ol class="grid_view">{items}</ol></body></html>'
+            return 404, ''
+        with self.lock:
+            failure = self.fail_once.pop(path, None)
+        if failure:
+            return failure, ''
+        if path.endswith('/comments'):
+            return 200, COMMENTS
+        return 404, ''
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServerTest(unittest.TestCase):
+
+    def setUp(self):
+        StubHandler.log = []
+        StubHandler.fail_once = {'/subject/2/comments': 403}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.baseurl = f'http://127.0.0.1:{self.server.server_port}/top250?start='
+
+        # Fast pacing and millisecond backoffs so the 403 retry does not sleep for seconds
+        self.rate_limiter = spider.rate_limiter
+        spider.rate_limiter = RateLimiter(rate=1000, burst=1000, backoff_max=0.01)
+
+    def tearDown(self):
+        spider.rate_limiter = self.rate_limiter
+        self.server.shutdown()
+        self.server.server_close()
+
+    def session(self, session_class=requests.Session, **kwargs):
+        session = session_class(**kwargs)
+        session.trust_env = False  # Never route the stub through a proxy
+        return session
+
+    def statuses(self, path):
+        return [status for logged_path, _, status in StubHandler.log if logged_path == path]
+
+
+class AsyncCrawlTest(StubServerTest):
+
+    def crawl(self, headers):
+        saved = []
+        asyncio.run(spider.getDataAsync(self.baseurl, headers, concurrency=4, max_per_host=4,
+                                        save=saved.append, session_factory=self.session))
+        return saved
+
+    def test_crawls_list_and_comment_pages(self):
+        saved = self.crawl({'User-Agent': 'test', 'Cookie': 'bid=initial'})
+
+        self.assertEqual([movie[2] for movie in saved], ['电影1', '电影2'])
+        first = saved[0]
+        self.assertEqual(first[0], f'http://127.0.0.1:{self.server.server_port}/subject/1/')
+        self.assertEqual(first[4], '9.1')
+        self.assertEqual(first[5], '1000')
+        self.assertIn('1994', first[7])
+        for movie in saved:
+            self.assertEqual(movie[8].split(' | '), ['非常好看', '值得一看', '经典之作', '百看不厌', '感人至深'])
+
+    def test_403_rotates_the_shared_bid_and_retries(self):
+        headers = {'User-Agent': 'test', 'Cookie': 'bid=initial'}
+        saved = self.crawl(headers)
+
+        self.assertEqual(len(saved), 2)
+        requests_for_movie = [(cookie, status) for path, cookie, status in StubHandler.log
+                              if path == '/subject/2/comments']
+        self.assertEqual([status for _, status in requests_for_movie], [403, 200])
+        blocked_cookie, retry_cookie = (cookie for cookie, _ in requests_for_movie)
+        self.assertEqual(blocked_cookie, 'bid=initial')
+        self.assertNotEqual(retry_cookie, blocked_cookie)
+        # The rotated bid is shared by the whole crawl, not thrown away after the retry
+        self.assertEqual(headers['Cookie'], retry_cookie)
+
+
+class CommentPageTest(StubServerTest):
+
+    def setUp(self):
+        super().setUp()
+        self.link = f'http://127.0.0.1:{self.server.server_port}/subject/1/'
+        self.headers = {'User-Agent': 'test', 'Cookie': 'bid=initial'}
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def fetch(self, session):
+        return spider.get_comment_page(self.link, 0, session, self.headers)
+
+    def test_server_error_is_retried_with_the_same_bid(self):
+        StubHandler.fail_once['/subject/1/comments'] = 503
+
+        page = self.fetch(self.session())
+
+        self.assertIn('非常好看', page)
+        self.assertEqual(self.statuses('/subject/1/comments'), [503, 200])
+        self.assertEqual(spider.rate_limiter.retries, 1)
+        # A server error is not a block, so the bid is kept
+        self.assertEqual(self.headers['Cookie'], 'bid=initial')
+
+    def test_stale_entry_is_revalidated_and_replayed_on_304(self):
+        session = self.session(CachedSession, cache_dir=self.cache_dir.name, max_age=0)
+
+        first = self.fetch(session)
+        second = self.fetch(session)
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.statuses('/subject/1/comments'), [200, 304])
+        self.assertEqual(session.stats, {'hits': 0, 'revalidated': 1, 'misses': 1, 'stored': 1})
+
+    def test_offline_replays_hits_and_gives_up_on_misses(self):
+        online = self.fetch(self.session(CachedSession, cache_dir=self.cache_dir.name))
+        offline = self.session(CachedSession, cache_dir=self.cache_dir.name, offline=True)
+
+        self.assertEqual(self.fetch(offline), online)
+        # A miss is answered with a 504 that is neither retried nor sent to the network
+        self.assertIsNone(spider.get_comment_page(self.link, 20, offline, self.headers))
+        self.assertEqual(offline.stats, {'hits': 1, 'revalidated': 0, 'misses': 1, 'stored': 0})
+        self.assertEqual(len(StubHandler.log), 1)
+        self.assertEqual(spider.rate_limiter.retries, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
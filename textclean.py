@@ -0,0 +1,52 @@
+import re
+import threading
+
+# Compiled once and shared by crawl-time comment cleaning (spider.clear)
+# and query-time preprocessing (segment_cache.preprocess_text)
+ALNUM = re.compile("[A-Za-z0-9]")
+CJK_PUNCTUATION = re.compile(r"[！!？｡。，&;＂★＃＄％＆＇（）＊＋－／：；＜＝＞＠［＼］＾＿｀｛｜｝～｟｠｢｣､、〃「」『』【】"
+                             r"〔〕〖〗〘〙#〚〛〜〝〞/?=~〟,〰–—‘’‛“”„‟…‧﹏.]")
+ASCII_PUNCTUATION = re.compile(r"[!\'\"#。$%&()*+,-.←→/:~;<=>?@[\\]^_`_{|}~")
+NON_WORD = re.compile(r'[^\w\s]')
+
+# Separator used to push a batch of comments through OpenCC in one call
+_BATCH_SEPARATOR = '\x1e'
+
+_converter = None
+_converter_lock = threading.Lock()
+
+
+def get_converter():
+    """Traditional to Simplified Chinese converter, created once per process"""
+    global _converter
+    if _converter is None:
+        with _converter_lock:
+            if _converter is None:
+                from opencc import OpenCC
+                _converter = OpenCC('t2s')
+    return _converter
+
+
+def _strip_noise(string):
+    string = ALNUM.sub("", string.strip())
+    string = CJK_PUNCTUATION.sub(" ", string)
+    return ASCII_PUNCTUATION.sub(" ", string)
+
+
+def clean_comment(string):
+    """Clean one comment: drop letters and digits, blank out punctuation, convert to Simplified"""
+    return get_converter().convert(_strip_noise(string)).lower()
+
+
+def clean_comments(strings):
+    """Clean a batch of comments with a single OpenCC conversion"""
+    strings = [_strip_noise(string).replace(_BATCH_SEPARATOR, " ") for string in strings]
+    if not strings:
+        return []
+    converted = get_converter().convert(_BATCH_SEPARATOR.join(strings))
+    return converted.lower().split(_BATCH_SEPARATOR)
+
+
+def strip_punctuation(text):
+    """Remove everything that is neither a word character nor whitespace"""
+    return NON_WORD.sub('', text)
@@ -22,6 +22,7 @@ def create_user_favorite_movies_table():
             id INT AUTO_INCREMENT PRIMARY KEY,
             user_id INT NOT NULL,
             movie_id INT NOT NULL,
+            UNIQUE KEY uk_user_movie (user_id, movie_id),
             FOREIGN KEY (user_id) REFERENCES users(id),
             FOREIGN KEY (movie_id) REFERENCES movie250(id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -37,5 +38,39 @@ def create_user_favorite_movies_table():
         cursor.close()
         conn.close()
 
+def migrate_user_favorite_movies_table():
+    """Add the (user_id, movie_id) unique key to tables created without it
+
+    Duplicate favorites left behind by racing toggles are removed first,
+    keeping the oldest row of each pair. The unique key also serves as the
+    covering index for per-user lookups (SELECT movie_id ... WHERE user_id).
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SHOW INDEX FROM user_favorite_movies WHERE Key_name = 'uk_user_movie'")
+        if cursor.fetchone():
+            print("Table user_favorite_movies is up to date")
+            return
+
+        cursor.execute("""
+            DELETE f1 FROM user_favorite_movies f1
+            JOIN user_favorite_movies f2
+              ON f1.user_id = f2.user_id AND f1.movie_id = f2.movie_id AND f1.id > f2.id
+        """)
+        print(f"Removed {cursor.rowcount} duplicate favorites")
+        cursor.execute("ALTER TABLE user_favorite_movies ADD UNIQUE KEY uk_user_movie (user_id, movie_id)")
+        conn.commit()
+        print("Unique key uk_user_movie added to user_favorite_movies!")
+
+    except Exception as e:
+        print(f"Error migrating table: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+
 if __name__ == "__main__":
-    create_user_favorite_movies_table()
\ No newline at end of file
+    create_user_favorite_movies_table()
+    migrate_user_favorite_movies_table()
\ No newline at end of file
@@ -0,0 +1,78 @@
+import importlib
+import os
+import threading
+import time
+
+# Modules app.py only needs once recommendations are requested
+HEAVY_MODULES = ('numpy', 'scipy.sparse', 'sklearn.feature_extraction.text', 'jieba', 'recommender')
+
+# "background" warms up after the server starts serving, "off" waits for the first request
+WARMUP_MODE = os.environ.get('DOUBAN_WARMUP', 'background')
+
+
+class Warmup:
+    """Background warm-up of the recommendation engine and its readiness state.
+
+    Runs the heavy imports (timing each one), loads the jieba dictionary
+    and calls build_engine() on a daemon thread, so neither worker startup
+    nor the first recommendation request pays for them.
+    """
+
+    def __init__(self):
+        self.import_times = {}
+        self.step_times = {}
+        self.ready = threading.Event()
+        self.error = None
+        self.started_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def timed_import(self, name):
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.import_times.setdefault(name, round((time.perf_counter() - start) * 1000, 1))
+        return module
+
+    def _step(self, name, func):
+        start = time.perf_counter()
+        func()
+        self.step_times[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def run(self, build_engine):
+        try:
+            for name in HEAVY_MODULES:
+                self.timed_import(name)
+            jieba = importlib.import_module('jieba')
+            self._step('jieba_dictionary', jieba.initialize)
+            self._step('engine_build', build_engine)
+            self.ready.set()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Warm-up failed: {self.error}")
+
+    def start(self, build_engine, delay=0.0):
+        """Start warming up once; later calls are no-ops"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+
+            def target():
+                if delay:
+                    time.sleep(delay)
+                self.run(build_engine)
+
+            self._thread = threading.Thread(target=target, name='warmup', daemon=True)
+            self._thread.start()
+
+    def status(self):
+        return {
+            'ready': self.ready.is_set(),
+            'started': self.started_at is not None,
+            'error': self.error,
+            'import_ms': dict(self.import_times),
+            'step_ms': dict(self.step_times),
+        }
+
+
+warmup = Warmup()
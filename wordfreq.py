@@ -0,0 +1,158 @@
+"""
+Offline word-frequency pipeline for the /word page.
+
+Segments every movie's comments and introduce with jieba and aggregates
+term frequencies overall and per movie type, without stopwords.
+Per-movie counts are kept in a state file keyed by a content hash, so a
+rebuild after spider.py adds or changes movies only segments those rows.
+The stored counts include stopwords, which are dropped while
+aggregating, so changing the stopword list applies to every movie.
+
+    python wordfreq.py [--image --font path/to/font.ttf]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from catalog import CatalogCache
+from segment_cache import SegmentationCache
+
+ARTIFACT_PATH = os.path.join('static', 'data', 'word_freq.json')
+IMAGE_PATH = os.path.join('static', 'data', 'word_cloud.png')
+STATE_PATH = os.path.join('cache', 'wordfreq_state.json.gz')
+TEXT_FIELDS = ('comments', 'introduce')
+TOP_N = 200
+# Bump when the per-movie counts in the state file change meaning
+STATE_FORMAT = 2
+
+STOPWORDS = frozenset('''
+的 了 是 我 你 他 她 它 们 这 那 就 都 也 还 在 有 和 与 及 或 但 而 又 很 太 最 更 没 没有 不 不是
+一个 一部 一种 一样 一直 一些 什么 怎么 这么 那么 这样 那样 这个 那个 这部 那部 自己 我们 你们 他们
+因为 所以 如果 虽然 但是 然后 还是 只是 就是 可以 可能 已经 觉得 知道 看到 看过 真的 其实 时候 之后
+以后 以前 之前 现在 一次 一下 起来 出来 下去 不会 不能 会 能 要 想 说 让 被 把 给 对 从 到 为 着 过
+电影 影片 片子 这片 导演 主演 故事 剧情 镜头
+'''.split())
+
+
+def load_stopwords(path=None):
+    """Built-in stopwords plus one word per line from an optional file"""
+    words = set(STOPWORDS)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            words.update(line.strip() for line in f if line.strip())
+    return words
+
+
+def movie_hash(movie):
+    text = '\x1f'.join(getattr(movie, field) or '' for field in TEXT_FIELDS)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def count_terms(movie, segmenter):
+    """Term counts for one movie's comments and introduce, stopwords included"""
+    counts = Counter()
+    for field in TEXT_FIELDS:
+        for word in segmenter.segment(movie.id, field, getattr(movie, field)).split():
+            if len(word) > 1 and not word.isdigit():
+                counts[word] += 1
+    return counts
+
+
+def load_state(path):
+    """Per-movie entries of the state file; empty if missing or written by an older format"""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get('format') != STATE_FORMAT:
+        return {}
+    return state['movies']
+
+
+def write_json(path, data, compress=False):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    opener = gzip.open if compress else open
+    with opener(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def render_image(frequencies, path, font_path):
+    """Pre-render a word cloud image if the optional wordcloud package is installed"""
+    try:
+        from wordcloud import WordCloud
+    except ImportError:
+        print("wordcloud is not installed; skipping image rendering")
+        return False
+    cloud = WordCloud(font_path=font_path, width=1200, height=800, background_color='white')
+    cloud.generate_from_frequencies(frequencies).to_file(path)
+    return True
+
+
+def build(artifact_path=ARTIFACT_PATH, state_path=STATE_PATH, top_n=TOP_N,
+          stopwords_path=None, image=False, font_path=None, catalog=None):
+    """Rebuild the word-frequency artifact, re-segmenting only new or changed movies"""
+    catalog = catalog or CatalogCache(probe_interval=0).get()
+    stopwords = load_stopwords(stopwords_path)
+    segmenter = SegmentationCache()
+    state = load_state(state_path)
+
+    fresh = {}
+    changed = 0
+    for movie in catalog.movies:
+        key = str(movie.id)
+        digest = movie_hash(movie)
+        entry = state.get(key)
+        if not entry or entry['hash'] != digest:
+            entry = {'hash': digest, 'counts': dict(count_terms(movie, segmenter))}
+            changed += 1
+        # Genres can change without the text changing, so always take them from the catalog
+        entry['genres'] = list(movie.genres)
+        fresh[key] = entry
+    segmenter.save()
+
+    overall = Counter()
+    by_type = {}
+    for entry in fresh.values():
+        counts = {word: count for word, count in entry['counts'].items() if word not in stopwords}
+        overall.update(counts)
+        for genre in entry['genres']:
+            by_type.setdefault(genre, Counter()).update(counts)
+
+    artifact = {
+        'version': [str(part) for part in catalog.version],
+        'generated_at': int(time.time()),
+        'overall': overall.most_common(top_n),
+        'by_type': {genre: counts.most_common(top_n) for genre, counts in sorted(by_type.items())},
+    }
+    write_json(artifact_path, artifact)
+    write_json(state_path, {'format': STATE_FORMAT, 'movies': fresh}, compress=True)
+    print(f"Word frequencies written to {artifact_path}: {len(fresh)} movies, {changed} re-segmented")
+
+    if image and overall:
+        image_path = os.path.join(os.path.dirname(artifact_path), os.path.basename(IMAGE_PATH))
+        render_image(dict(overall.most_common(top_n)), image_path, font_path)
+    return artifact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the word-frequency artifact served by /word")
+    parser.add_argument('--output', default=ARTIFACT_PATH)
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--stopwords', help="extra stopwords file, one word per line")
+    parser.add_argument('--image', action='store_true', help="also pre-render a word cloud PNG")
+    parser.add_argument('--font', help="CJK font for the word cloud image")
+    args = parser.parse_args(argv)
+    build(args.output, top_n=args.top, stopwords_path=args.stopwords, image=args.image, font_path=args.font)
+
+
+if __name__ == '__main__':
+    main()